@@ -1,62 +1,461 @@
-from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.prompts import PromptTemplate
+import asyncio
 import logging
 import re
-from typing import List, Dict
+import threading
+from typing import AsyncIterator, List, Dict, Optional
 from uagents import Context
 import os
 
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.clients import get_async_openai, get_chat_model, get_embeddings
+from agent_common.query_cache import CachedEmbeddings
+from agent_common.vector_index import MmapIndex, index_version
+from answer_cache import ANSWER_CACHE_ENABLED, AnswerCache
+from deadline import Deadline, DeadlineExceeded
+from lexical_index import LexicalIndex, fuse_rankings
+from prompt_packer import count_tokens, pack_prompt
+
 logging.basicConfig(level=logging.INFO)
 
 PROMPT_PATH = os.path.join(os.path.dirname(__file__), "a2rchi_prompt.txt")
+# Built by build_index.py; not checked in
+INDEX_DIR = os.path.join(os.path.dirname(__file__), "a2rchi_index")
 
 with open(PROMPT_PATH, "r", encoding="utf-8") as f:
     prompt_text = f.read()
 
 a2rchi_prompt = PromptTemplate.from_template(prompt_text)
+TEMPLATE_TOKENS = count_tokens(a2rchi_prompt.format(context="", chat_history="", question=""))
+
+# Chunks retrieved per question; the packer keeps as many as the budget allows
+RETRIEVAL_K = 10
+# Candidates each ranking contributes before hybrid fusion
+FUSION_CANDIDATES = 3 * RETRIEVAL_K
+# Answer from BM25 alone, with no embedding call, when the question's keywords
+# carry at least LEXICAL_MIN_IDF and at least LEXICAL_MIN_HITS chunks contain
+# terms worth LEXICAL_COVERAGE of it. Off unless A2RCHI_LEXICAL_FAST_PATH=1:
+# the idf threshold is not tuned against bench_questions.json yet
+LEXICAL_FAST_PATH = os.getenv("A2RCHI_LEXICAL_FAST_PATH", "0") == "1"
+LEXICAL_COVERAGE = float(os.getenv("A2RCHI_LEXICAL_COVERAGE", "0.9"))
+LEXICAL_MIN_HITS = 3
+LEXICAL_MIN_IDF = 6.0
+
+# Process-wide vector index, shared by every session.
+# It is loaded once and swapped in whole when build_index.py writes a new one.
+_vectorstore: Optional[MmapIndex] = None
+_vectorstore_version: Optional[int] = None
+_lexical_index: Optional[LexicalIndex] = None
+_vectorstore_lock = threading.Lock()
+_query_embeddings: Optional[CachedEmbeddings] = None
+
+def get_query_embeddings() -> CachedEmbeddings:
+    """Query embedder shared across index reloads, so its cache survives them."""
+    global _query_embeddings
+    if _query_embeddings is None:
+        _query_embeddings = CachedEmbeddings(get_embeddings())
+    return _query_embeddings
+
+def load_vectorstore(index_dir: str = INDEX_DIR) -> MmapIndex:
+    return MmapIndex(index_dir)
+
+def load_indexes(index_dir: str = INDEX_DIR):
+    return load_vectorstore(index_dir), LexicalIndex.open(index_dir)
+
+def get_vectorstore(index_dir: str = INDEX_DIR) -> MmapIndex:
+    """Returns the shared vector index, loading it on first use if startup didn't."""
+    global _vectorstore, _vectorstore_version, _lexical_index
+    if _vectorstore is None:
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                version = index_version(index_dir)
+                _vectorstore, _lexical_index = load_indexes(index_dir)
+                _vectorstore_version = version
+    return _vectorstore
+
+def get_lexical_index(index_dir: str = INDEX_DIR) -> Optional[LexicalIndex]:
+    """The BM25 index matching get_vectorstore(), or None if the index has none."""
+    get_vectorstore(index_dir)
+    return _lexical_index
+
+async def refresh_vectorstore(index_dir: str = INDEX_DIR) -> bool:
+    """
+    Reloads the vector index in a worker thread if it changed on disk, and
+    empties the answer cache. In-flight requests keep the old index; new
+    requests see the new one.
+    Returns True if a new index was swapped in.
+    """
+    global _vectorstore, _vectorstore_version, _lexical_index
+    version = index_version(index_dir)
+    if version is None or (_vectorstore is not None and version == _vectorstore_version):
+        return False
+
+    vectorstore, lexical = await asyncio.to_thread(load_indexes, index_dir)
+    with _vectorstore_lock:
+        _vectorstore, _lexical_index = vectorstore, lexical
+        _vectorstore_version = version
+    # Cached answers were written from the old index's chunks
+    answer_cache.clear()
+    logging.info(f"🔄 Loaded vector index from {index_dir}")
+    return True
+
+answer_cache = AnswerCache()
+
+ANSWER_ERROR = "Sorry, I couldn’t retrieve an answer. Please try again later."
+ANSWER_INTERRUPTED = "\n\nSorry, I couldn’t finish this answer. Please try again later."
+ANSWER_TIMEOUT = "Sorry, that took longer than I’m allowed to wait. Please try again in a moment."
+
+# Latency budget per question, from arrival to the last piece of the answer
+ANSWER_DEADLINE = float(os.getenv("A2RCHI_DEADLINE", "30"))
+# Most of the budget the query embedding may use before retrieval is skipped
+EMBED_TIMEOUT = 5.0
+# Below this much time left, answer from fewer chunks and with a shorter reply
+LOW_BUDGET_SECONDS = 12.0
+DEGRADED_K = 4
+DEGRADED_MAX_TOKENS = 400
+
+# Streamed answers are sent in pieces that end at a sentence or paragraph break
+STREAM_MIN_CHARS = 200
+STREAM_MAX_CHARS = 1200
+SENTENCE_END = re.compile(r'[.!?:]\s+|\n\n')
+
+def warmup_steps():
+    """Startup steps for warmup.run_warmup: everything the first question would otherwise pay for."""
 
-# Helper: load FAISS vector index
-def get_vectorstore(index_dir: str = "a2rchi_index") -> FAISS:
-    return FAISS.load_local(index_dir, OpenAIEmbeddings(), allow_dangerous_deserialization=True)
+    async def build_clients():
+        get_chat_model("gpt-4o", temperature=0)
+        get_query_embeddings()
 
-def format_history(history: List[Dict[str, str]]) -> str:
-    formatted = []
-    for turn in history[-10:]:
+    async def load_index():
+        await refresh_vectorstore()
+        get_vectorstore()
+
+    async def prime_pool():
+        await get_async_openai().models.list()
+
+    async def dummy_retrieval():
+        # Searches with a stored vector, so no embedding call is needed
+        vectorstore = get_vectorstore()
+        if len(vectorstore):
+            retrieve("Newton's second law", vectorstore.vectors[0], RETRIEVAL_K)
+
+    return [
+        ("clients", build_clients),
+        ("index", load_index),
+        ("connection pool", prime_pool),
+        ("retrieval", dummy_retrieval),
+    ]
+
+def format_history(history: List[Dict[str, str]], summary: str = "") -> str:
+    formatted = [f"Summary of earlier conversation: {summary}"] if summary else []
+    for turn in history:
         role = "User" if turn["role"] == "user" else "A2rchi"
         formatted.append(f"{role}: {turn['content']}")
     return "\n".join(formatted)
 
-# Main question answering function
-async def answer_physics_question(user_question: str, ctx: Context, history: List[Dict[str, str]]) -> str:
+FENCE = "```"
+
+# Cleanup of formatting artifacts in LLM output
+def clean_prose(text: str) -> str:
+    text = re.sub(r'\(\s*`', r'`', text)
+    text = re.sub(r'`([^`]+)`[)\.,;:!?…]*', r'`\1`', text)
+    return text
+
+def clean_response(text: str) -> str:
+    """Cleans the prose; code in ``` fences (closed or not) is left as written."""
+    parts = text.split(FENCE)
+    parts[::2] = [clean_prose(p) for p in parts[::2]]
+    return FENCE.join(parts)
+
+class StreamingCleaner:
     """
-    Answers a Classical Mechanics (8.01) question using a FAISS-powered context + LLM.
+    Applies clean_response to a token stream, with the same result as
+    cleaning the whole answer at once. Prose is released only up to
+    whitespace that can't be part of a match: outside backtick spans and
+    not right after an opening parenthesis. A fenced code block is held
+    back until its closing fence arrives, then released unchanged.
     """
-    try:
-        vectorstore = get_vectorstore()
-        retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
-        docs = await retriever.ainvoke(user_question)
-        context = "\n\n".join(doc.page_content.strip() for doc in docs)
 
-        chat_history = format_history(history)
+    def __init__(self):
+        self.buffer = ""
+        self.in_code = False
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        out = []
+        while True:
+            fence = self.buffer.find(FENCE)
+            if fence < 0:
+                break
+            # Everything before a fence is a complete prose segment or code block
+            segment = self.buffer[:fence]
+            out.append(segment if self.in_code else clean_prose(segment))
+            out.append(FENCE)
+            self.buffer = self.buffer[fence + len(FENCE):]
+            self.in_code = not self.in_code
+        if not self.in_code:
+            out.append(self._release_prose())
+        return "".join(out)
+
+    def _release_prose(self) -> str:
+        cut = len(self.buffer)
+        while True:
+            cut = max(self.buffer.rfind(" ", 0, cut), self.buffer.rfind("\n", 0, cut))
+            if cut <= 0:
+                return ""
+            head = self.buffer[:cut]
+            if head.count("`") % 2 == 0 and not head.rstrip().endswith("("):
+                break
+        self.buffer = self.buffer[cut:]
+        return clean_prose(head)
 
+    def flush(self) -> str:
+        text, self.buffer = self.buffer, ""
+        return text if self.in_code else clean_prose(text)
+
+def lexical_fast_path(user_question: str, k: int) -> Optional[List[str]]:
+    """Chunk texts for a question BM25 alone can answer confidently, else None."""
+    lexical = get_lexical_index()
+    if not LEXICAL_FAST_PATH or lexical is None:
+        return None
+    hits = lexical.confident_search(user_question, k, LEXICAL_COVERAGE, LEXICAL_MIN_HITS, LEXICAL_MIN_IDF)
+    if not hits:
+        return None
+    vectorstore = get_vectorstore()
+    return [vectorstore.document(row).page_content for row, _ in hits]
+
+def retrieve(user_question: str, question_vector, k: int) -> List[str]:
+    """
+    Hybrid retrieval: fuses the vector and BM25 rankings by reciprocal rank.
+    With no question vector (embedding timed out) only BM25 is used, and
+    with no BM25 index only vectors.
+    """
+    vectorstore = get_vectorstore()
+    lexical = get_lexical_index()
+    rankings = []
+    if question_vector is not None:
+        rankings.append([row for row, _ in vectorstore.search(question_vector, FUSION_CANDIDATES)])
+    if lexical is not None:
+        rankings.append([row for row, _ in lexical.search(user_question, FUSION_CANDIDATES)])
+    return [vectorstore.document(row).page_content for row in fuse_rankings(rankings, k)]
+
+async def prepare_question(
+    user_question: str,
+    history: List[Dict[str, str]],
+    summary: str,
+    use_cache: bool,
+    deadline: Deadline,
+):
+    """
+    Retrieves context and returns (cached answer or None, question vector,
+    formatted history, prompt). The prompt is None on a cache hit. The
+    question vector is None if it wasn't needed (lexical fast path, not
+    cached locally) or embedding ran out of time.
+    """
+    chat_history = format_history(history, summary)
+    k = RETRIEVAL_K
+
+    with deadline.stage("lexical"):
+        chunks = lexical_fast_path(user_question, k)
+    if chunks is not None:
+        # No embedding call; a locally cached vector still allows the answer cache
+        logging.info(f"🔤 Lexical fast path: {len(chunks)} chunks")
+        question_vector = get_query_embeddings().cached_query(user_question)
+    else:
+        try:
+            question_vector = await deadline.run(
+                "embed", get_query_embeddings().aembed_query(user_question), limit=EMBED_TIMEOUT
+            )
+        except DeadlineExceeded as e:
+            logging.warning(f"⏱️ {e}; retrieving by keywords only")
+            deadline.degrade("no embedding")
+            question_vector = None
+
+    if use_cache and question_vector is not None:
+        cached = answer_cache.get(question_vector, chat_history, user_question)
+        if cached is not None:
+            return cached.answer, question_vector, chat_history, None
+
+    if chunks is None:
+        if deadline.remaining() < LOW_BUDGET_SECONDS:
+            k = DEGRADED_K
+            deadline.degrade(f"k={k}")
+        with deadline.stage("retrieve"):
+            chunks = retrieve(user_question, question_vector, k)
+        logging.info(f"📊 Query embedding cache: {get_query_embeddings().stats()}")
+
+    with deadline.stage("pack"):
+        packed = pack_prompt(user_question, TEMPLATE_TOKENS, chunks, history, summary)
         prompt = a2rchi_prompt.format(
-            context=context,
-            chat_history=chat_history,
+            context=packed.context,
+            chat_history=packed.chat_history,
             question=user_question
         )
+    return None, question_vector, chat_history, prompt
 
-        llm = ChatOpenAI(model="gpt-4o", temperature=0)
-        llm_response = await llm.ainvoke(prompt)
+def answer_model(deadline: Deadline):
+    """The answering LLM, capped to a short reply if little time is left."""
+    if deadline.remaining() < LOW_BUDGET_SECONDS:
+        deadline.degrade(f"max_tokens={DEGRADED_MAX_TOKENS}")
+        return get_chat_model("gpt-4o", temperature=0, max_tokens=DEGRADED_MAX_TOKENS)
+    return get_chat_model("gpt-4o", temperature=0)
 
-        response = llm_response.content
+def fallback_answer(user_question: str, question_vector, chat_history: str, deadline: Deadline) -> str:
+    """
+    What to reply when generation ran out of time: a cached answer to the
+    same question, if any. The match is as strict as a normal cache hit,
+    since the reply doesn't say which question it answered.
+    """
+    if question_vector is not None:
+        cached = answer_cache.get(question_vector, chat_history, user_question)
+        if cached is not None:
+            deadline.degrade("cached answer")
+            return cached.answer
+    deadline.degrade("timeout")
+    return ANSWER_TIMEOUT
 
-        # Cleanup formatting artifacts
-        response = re.sub(r'\(\s*`', r'`', response)
-        response = re.sub(r'`([^`]+)`[)\.,;:!?…]*', r'`\1`', response)
+# Main question answering function
+async def answer_physics_question(
+    user_question: str,
+    ctx: Context,
+    history: List[Dict[str, str]],
+    summary: str = "",
+    use_cache: bool = ANSWER_CACHE_ENABLED,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Answers a Classical Mechanics (8.01) question using vector-retrieved context + LLM.
+    With use_cache, a near-identical earlier question asked after the same
+    history gets the earlier answer back without calling the LLM.
+    deadline is the request's latency budget (ANSWER_DEADLINE by default).
+    """
+    deadline = deadline or Deadline(ANSWER_DEADLINE)
+    question_vector, chat_history = None, ""
+    try:
+        cached, question_vector, chat_history, prompt = await prepare_question(
+            user_question, history, summary, use_cache, deadline
+        )
+        if cached is not None:
+            return cached
+
+        llm_response = await deadline.run("generate", answer_model(deadline).ainvoke(prompt))
+        response = clean_response(llm_response.content)
+
+        # Degraded answers are not what a full-budget request would get
+        if use_cache and question_vector is not None and not deadline.degraded:
+            answer_cache.put(question_vector, chat_history, user_question, response, deadline.elapsed())
+            logging.info(f"💾 Answer cache miss; {answer_cache.summary()}")
 
         return response
 
+    except DeadlineExceeded as e:
+        logging.warning(f"⏱️ {e}")
+        return fallback_answer(user_question, question_vector, chat_history, deadline)
+
     except Exception as e:
         logging.error(f"❌ Error answering question: {e}")
-        return "Sorry, I couldn’t retrieve an answer. Please try again later."
+        return ANSWER_ERROR
+
+    finally:
+        logging.info(f"⏱️ Answer timing: {deadline.summary()}")
+
+async def stream_physics_answer(
+    user_question: str,
+    ctx: Context,
+    history: List[Dict[str, str]],
+    summary: str = "",
+    use_cache: bool = ANSWER_CACHE_ENABLED,
+    min_chars: int = STREAM_MIN_CHARS,
+    max_chars: int = STREAM_MAX_CHARS,
+    deadline: Optional[Deadline] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of answer_physics_question. Yields cleaned pieces of
+    the answer, each ending at a sentence break once it has min_chars, or
+    as soon as it reaches max_chars. If the deadline passes mid-answer the
+    stream ends with a note that the answer is incomplete.
+    """
+    deadline = deadline or Deadline(ANSWER_DEADLINE)
+    question_vector, chat_history = None, ""
+    sent_any = False
+    stream = None
+    try:
+        cached, question_vector, chat_history, prompt = await prepare_question(
+            user_question, history, summary, use_cache, deadline
+        )
+        if cached is not None:
+            yield cached
+            return
+
+        stream = answer_model(deadline).astream(prompt)
+        cleaner = StreamingCleaner()
+        pending = ""
+        parts = []
+        while True:
+            try:
+                chunk = await deadline.run("generate", stream.__anext__())
+            except StopAsyncIteration:
+                break
+            pending += cleaner.feed(chunk.content)
+            cut = flush_point(pending, min_chars, max_chars)
+            if cut:
+                if not sent_any:
+                    logging.info(f"⚡ First chunk after {deadline.elapsed():.2f}s")
+                parts.append(pending[:cut])
+                sent_any = True
+                yield pending[:cut]
+                pending = pending[cut:]
+
+        pending += cleaner.flush()
+        if pending:
+            parts.append(pending)
+            sent_any = True
+            yield pending
+
+        if use_cache and question_vector is not None and not deadline.degraded:
+            answer_cache.put(question_vector, chat_history, user_question, "".join(parts), deadline.elapsed())
+            logging.info(f"💾 Answer cache miss; {answer_cache.summary()}")
+
+    except DeadlineExceeded as e:
+        logging.warning(f"⏱️ {e}")
+        if sent_any:
+            deadline.degrade("truncated")
+            yield ANSWER_INTERRUPTED
+        else:
+            yield fallback_answer(user_question, question_vector, chat_history, deadline)
+
+    except Exception as e:
+        logging.error(f"❌ Error answering question: {e}")
+        yield ANSWER_INTERRUPTED if sent_any else ANSWER_ERROR
+
+    finally:
+        if stream is not None:
+            await stream.aclose()
+        logging.info(f"⏱️ Answer timing: {deadline.summary()}")
+
+async def summarize_turns(summary: str, turns: List[Dict[str, str]]) -> str:
+    """Folds turns into the rolling summary of a session's older conversation."""
+    prompt = (
+        "You maintain a short running summary of a tutoring conversation between a student "
+        "and A2rchi, a Classical Mechanics (8.01) teaching assistant. Update the summary with "
+        "the new turns. Keep the topics, problems and facts the student may refer back to. "
+        "Reply with the summary only, at most 150 words.\n\n"
+        f"Current summary: {summary or '(none)'}\n\n"
+        f"New turns:\n{format_history(turns)}"
+    )
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
+    response = await llm.ainvoke(prompt)
+    return response.content.strip()
+
+def flush_point(text: str, min_chars: int, max_chars: int) -> int:
+    """Returns how much of text to send now, or 0 to keep buffering."""
+    if len(text) >= min_chars:
+        match = None
+        for match in SENTENCE_END.finditer(text, min_chars - 1):
+            pass
+        if match:
+            return match.end()
+    if len(text) >= max_chars:
+        space = text.rfind(" ", 0, max_chars)
+        return space + 1 if space > 0 else max_chars
+    return 0
@@ -1,5 +1,17 @@
-from uagents import Agent
-from chat_proto import chat_proto
+from uagents import Agent, Context
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.clients import pool_stats
+from agent_common.warmup import run_warmup
+from a2rchi import refresh_vectorstore, warmup_steps
+from chat_proto import chat_proto, session_store
+from session_memory import expire_idle_sessions
+
+# How often to check whether build_index.py wrote a new index
+INDEX_POLL_SECONDS = 30
+# How often to drop idle chat sessions from storage
+SESSION_SWEEP_SECONDS = 3600
+# How often to log HTTP connection pool counters
+POOL_STATS_SECONDS = 300
 
 # Create the agent with mailbox enabled
 agent = Agent(
@@ -11,6 +23,35 @@ agent = Agent(
 # Attach the chat protocol
 agent.include(chat_proto)
 
+# Load the index, build clients and open connections before the first question
+@agent.on_event("startup")
+async def warmup(ctx: Context):
+    await run_warmup(warmup_steps(), ctx.logger)
+
+# Pick up rebuilt indexes without a restart
+@agent.on_interval(period=INDEX_POLL_SECONDS)
+async def reload_index(ctx: Context):
+    try:
+        if await refresh_vectorstore():
+            ctx.logger.info("🔄 Swapped in rebuilt vector index")
+    except Exception as e:
+        ctx.logger.error(f"❌ Failed to reload vector index: {e}")
+
+# Drop sessions nobody has used in a while
+@agent.on_interval(period=SESSION_SWEEP_SECONDS)
+async def sweep_sessions(ctx: Context):
+    if session_store is not None:
+        expired = session_store.expire()
+    else:
+        expired = expire_idle_sessions(ctx.storage)
+    if expired:
+        ctx.logger.info(f"🧹 Expired {expired} idle session entries")
+
+# Connection reuse: connections_opened should stay far below requests
+@agent.on_interval(period=POOL_STATS_SECONDS)
+async def log_pool_stats(ctx: Context):
+    ctx.logger.info(f"🌐 HTTP pools: {pool_stats()}")
+
 # Run the agent
 if __name__ == "__main__":
     agent.run()
@@ -0,0 +1,134 @@
+"""
+Semantic cache of A2rchi answers.
+
+An answer is reused when the conversation history hashes the same, the
+new question's embedding is within max_distance (cosine) of a cached one,
+and both questions have the same numbers and the same keywords. Related
+physics questions ("second law" vs "third law", or the same problem with
+other numbers) embed very close together, so distance alone can't tell
+them apart. Entries expire after ttl seconds and the least recently used
+are dropped past max_entries. clear() drops everything, e.g. when a new
+index changes what an answer would say.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.query_cache import normalize_query
+from lexical_index import tokenize
+
+ANSWER_CACHE_ENABLED = os.getenv("A2RCHI_ANSWER_CACHE", "1") != "0"
+ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("A2RCHI_ANSWER_CACHE_DISTANCE", "0.02"))
+ANSWER_CACHE_TTL = float(os.getenv("A2RCHI_ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("A2RCHI_ANSWER_CACHE_SIZE", "2048"))
+
+
+_number = re.compile(r"\d+(?:[.,]\d+)*")
+_possessive = re.compile(r"['’]s\b")
+
+
+@dataclass
+class CachedAnswer:
+    history_hash: str
+    vector: np.ndarray
+    question: str
+    terms: Tuple[Tuple[str, ...], FrozenSet[str]]
+    answer: str
+    seconds: float
+    created: float
+    last_used: float
+
+
+def history_hash(chat_history: str) -> str:
+    return hashlib.sha256(chat_history.encode("utf-8")).hexdigest()
+
+
+def question_terms(question: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """The numbers in a question, in order, and its keywords (stopwords dropped, plurals folded)."""
+    text = _possessive.sub("", normalize_query(question))
+    numbers = tuple(_number.findall(text))
+    return numbers, frozenset(tokenize(_number.sub(" ", text)))
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_distance: float = ANSWER_CACHE_MAX_DISTANCE,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: List[CachedAnswer] = []
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _expire(self, now: float):
+        self.entries = [e for e in self.entries if now - e.created < self.ttl]
+
+    def get(self, vector, chat_history: str, question: str) -> Optional[CachedAnswer]:
+        """Best entry for the same history and question terms within max_distance."""
+        h = history_hash(chat_history)
+        terms = question_terms(question)
+        q = self._unit(vector)
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            candidates = [e for e in self.entries if e.history_hash == h and e.terms == terms]
+            best = None
+            if candidates:
+                distances = 1.0 - np.stack([e.vector for e in candidates]) @ q
+                i = int(np.argmin(distances))
+                if distances[i] <= self.max_distance:
+                    best = candidates[i]
+
+            if best is None:
+                self.misses += 1
+                return None
+            best.last_used = now
+            self.hits += 1
+            self.seconds_saved += best.seconds
+            logging.info(
+                f"💾 Answer cache hit for {best.question!r} "
+                f"(distance {float(distances[i]):.3f}, saved {best.seconds:.1f}s); {self.summary()}"
+            )
+            return best
+
+    def put(self, vector, chat_history: str, question: str, answer: str, seconds: float):
+        now = time.time()
+        entry = CachedAnswer(
+            history_hash(chat_history), self._unit(vector), question, question_terms(question), answer, seconds, now, now
+        )
+        with self.lock:
+            self._expire(now)
+            self.entries.append(entry)
+            if len(self.entries) > self.max_entries:
+                self.entries.sort(key=lambda e: e.last_used)
+                del self.entries[: len(self.entries) - self.max_entries]
+
+    def clear(self):
+        with self.lock:
+            self.entries = []
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"hit rate {rate:.1%} ({self.hits}/{lookups}), {self.seconds_saved:.1f}s saved, {len(self.entries)} entries"
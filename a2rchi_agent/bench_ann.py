@@ -0,0 +1,104 @@
+"""
+Compares the exact and approximate search backends in vector_index.py.
+
+For each corpus size it writes a throwaway index, builds every ANN backend
+over it and reports recall@k against exact search, p50/p99 query latency
+and index size. Vectors are synthetic clusters unless --index points at a
+real index, in which case its vectors are sampled (with noise) to reach
+each size.
+
+    python bench_ann.py --sizes 10000 100000 500000 --k 5
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.vector_index import ANN_BACKENDS, IndexWriter, MmapIndex, build_ann
+
+
+def synthetic_vectors(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(max(1, n // 200), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def sampled_vectors(source: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = source[rng.integers(0, len(source), n)] + 0.01 * rng.normal(size=(n, source.shape[1])).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def index_bytes(index_dir: str, backend: str) -> int:
+    if backend == "flat":
+        return os.path.getsize(os.path.join(index_dir, "vectors.f32"))
+    return os.path.getsize(os.path.join(index_dir, "ann.faiss"))
+
+
+def time_queries(index: MmapIndex, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append([i for i, _ in index.search(q, k)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def recall(results: List[List[int]], truth: List[List[int]], k: int) -> float:
+    return float(np.mean([len(set(r[:k]) & set(t[:k])) / k for r, t in zip(results, truth)]))
+
+
+def run(sizes: List[int], dim: int, k: int, n_queries: int, backends: List[str], source_index: str = None):
+    rng = np.random.default_rng(0)
+    source = np.asarray(MmapIndex(source_index).vectors) if source_index else None
+    if source is not None:
+        dim = source.shape[1]
+
+    print(f"{'size':>9} {'backend':>8} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8} {'MiB':>8} {'build s':>8}")
+    for n in sizes:
+        vectors = sampled_vectors(source, n, rng) if source is not None else synthetic_vectors(n, dim, rng)
+        queries = vectors[rng.integers(0, n, n_queries)] + 0.05 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+
+        workdir = tempfile.mkdtemp(prefix="bench_ann_")
+        try:
+            writer = IndexWriter(workdir, "synthetic")
+            for start in range(0, n, 65536):
+                rows = vectors[start:start + 65536]
+                writer.add(rows, [{"id": str(start + i), "text": "", "metadata": {}} for i in range(len(rows))])
+            writer.close()
+
+            truth = None
+            for backend in ["flat"] + [b for b in backends if b != "flat"]:
+                start = time.perf_counter()
+                try:
+                    build_ann(workdir, backend)
+                except ValueError as e:
+                    print(f"{n:>9} {backend:>8}  skipped: {e}")
+                    continue
+                build_seconds = time.perf_counter() - start
+
+                index = MmapIndex(workdir)
+                results, p50, p99 = time_queries(index, queries, k)
+                if truth is None:
+                    truth = results
+                mib = index_bytes(workdir, backend) / 2**20
+                print(f"{n:>9} {backend:>8} {recall(results, truth, k):>9.3f} {p50:>8.2f} {p99:>8.2f} {mib:>8.1f} {build_seconds:>8.1f}")
+        finally:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ANN backends against exact search.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--dim", type=int, default=1536, help="vector size for synthetic corpora")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", choices=ANN_BACKENDS, default=list(ANN_BACKENDS))
+    parser.add_argument("--index", help="sample vectors from this index instead of synthetic clusters")
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.k, args.queries, args.backends, args.index)
@@ -0,0 +1,176 @@
+"""
+Sweeps chunking parameters for the A2rchi index.
+
+For each (chunk_size, chunk_overlap) it splits the textbook, builds an
+index and its BM25 index in a temp directory, then runs the labeled
+questions in bench_questions.json through hybrid retrieval for each k.
+Reports chunk count, index size, build time, p50 retrieval latency,
+mean context tokens per question and recall@k. Each question is labeled
+with the textbook file and 1-based PDF pages that answer it, plus answer
+phrases from those pages that do not occur in the question itself. A
+question counts as recalled when a retrieved chunk comes from one of its
+pages and contains one of its answer phrases, so a chunk that merely
+repeats the question's wording does not score.
+
+Embeddings come from a deterministic hashing embedder, so the sweep runs
+offline and costs nothing. Recall measures chunking plus hybrid retrieval
+under that embedder, not the absolute quality of ada-002. Pages are read
+through the page cache, so after one build_index.py run no PDF is parsed.
+
+    python bench_chunking.py --chunk-sizes 300 500 800 1200 --overlaps 0 50 100 --k 4 10
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.vector_index import IndexWriter, MmapIndex
+from build_index import load_file, scan_files
+from lexical_index import LexicalIndex, build_lexical_index, fuse_rankings, tokenize
+from page_cache import PAGE_CACHE_DIR
+from prompt_packer import count_tokens
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "bench_questions.json")
+
+
+class HashingEmbeddings:
+    """Signed feature hashing of words and word bigrams, L2-normalized. Deterministic across runs."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        words = tokenize(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed(text)
+
+
+def squash(text: str) -> str:
+    # PDF extraction drops spaces and hyphenates, so compare letters and digits only
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def load_pages(page_cache: str):
+    pages = []
+    for info in scan_files().values():
+        loaded, _ = load_file(info["path"], info["type"], info["sha256"], page_cache)
+        pages.extend(loaded)
+    return pages
+
+
+def build(pages, chunk_size: int, overlap: int, embedder: HashingEmbeddings, index_dir: str):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
+    chunks = splitter.split_documents(pages)
+    writer = IndexWriter(index_dir, "hashing")
+    for start in range(0, len(chunks), 1024):
+        batch = chunks[start:start + 1024]
+        writer.add(
+            embedder.embed_documents([c.page_content for c in batch]),
+            [{"id": str(start + i), "text": c.page_content, "metadata": c.metadata} for i, c in enumerate(batch)],
+        )
+    writer.close()
+    build_lexical_index(index_dir)
+    return len(chunks)
+
+
+def retrieve(index: MmapIndex, lexical: LexicalIndex, embedder: HashingEmbeddings, question: str, k: int) -> List[Dict]:
+    """Same fusion as a2rchi.retrieve; returns the docstore records."""
+    rankings = [
+        [row for row, _ in index.search(embedder.embed_query(question), 3 * k)],
+        [row for row, _ in lexical.search(question, 3 * k)],
+    ]
+    return [index.record(row) for row in fuse_rankings(rankings, k)]
+
+
+def recalled(question: Dict, records: List[Dict]) -> bool:
+    answers = [squash(a) for a in question["answers"]]
+    for record in records:
+        metadata = record["metadata"]
+        # PyPDFLoader numbers pages from 0; the labels use PDF page numbers
+        if metadata.get("source") != question["source"] or metadata.get("page", -1) + 1 not in question["pages"]:
+            continue
+        text = squash(record["text"])
+        if any(a in text for a in answers):
+            return True
+    return False
+
+
+def disk_bytes(index_dir: str) -> int:
+    return sum(os.path.getsize(os.path.join(index_dir, f)) for f in os.listdir(index_dir))
+
+
+def run(chunk_sizes: List[int], overlaps: List[int], ks: List[int], questions: List[Dict], page_cache: str, dim: int):
+    start = time.perf_counter()
+    pages = load_pages(page_cache)
+    print(f"📄 {len(pages)} pages loaded in {time.perf_counter() - start:.1f}s")
+    labeled = {(p.metadata["source"], p.metadata.get("page", -1) + 1): squash(p.page_content) for p in pages}
+    answerable = [
+        q for q in questions
+        if any(squash(a) in labeled.get((q["source"], page), "") for a in q["answers"] for page in q["pages"])
+    ]
+    if len(answerable) < len(questions):
+        print(f"⚠️ {len(questions) - len(answerable)} questions have no answer phrase on their labeled pages and are skipped")
+    embedder = HashingEmbeddings(dim)
+
+    print(f"{'size':>6} {'overlap':>8} {'chunks':>7} {'MiB':>6} {'build s':>8} {'k':>4} {'p50 ms':>7} {'ctx tok':>8} {'recall':>7}")
+    for chunk_size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= chunk_size:
+                continue
+            workdir = tempfile.mkdtemp(prefix="bench_chunking_")
+            try:
+                build_start = time.perf_counter()
+                n_chunks = build(pages, chunk_size, overlap, embedder, workdir)
+                build_seconds = time.perf_counter() - build_start
+                index, lexical = MmapIndex(workdir), LexicalIndex(workdir)
+                mib = disk_bytes(workdir) / 2**20
+
+                for k in ks:
+                    latencies, tokens, hits = [], [], 0
+                    for q in answerable:
+                        query_start = time.perf_counter()
+                        records = retrieve(index, lexical, embedder, q["question"], k)
+                        latencies.append((time.perf_counter() - query_start) * 1000)
+                        tokens.append(sum(count_tokens(r["text"]) for r in records))
+                        hits += recalled(q, records)
+                    recall = hits / len(answerable) if answerable else 0.0
+                    print(
+                        f"{chunk_size:>6} {overlap:>8} {n_chunks:>7} {mib:>6.1f} {build_seconds:>8.2f} {k:>4} "
+                        f"{np.percentile(latencies, 50):>7.2f} {np.mean(tokens):>8.0f} {recall:>7.2f}"
+                    )
+            finally:
+                shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep chunk size, overlap and k for the A2rchi index.")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[300, 500, 800, 1200])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="JSON list of {question, source, pages, answers}")
+    parser.add_argument("--page-cache", default=PAGE_CACHE_DIR)
+    parser.add_argument("--dim", type=int, default=512, help="hashing embedding size")
+    args = parser.parse_args()
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    run(args.chunk_sizes, args.overlaps, args.k, questions, args.page_cache, args.dim)
@@ -0,0 +1,57 @@
+"""
+Measures what reusing pooled connections saves per request.
+
+Sends the same request sequentially with a fresh httpx client each time
+(new TCP + TLS handshake, as when ChatOpenAI/OpenAIEmbeddings were built
+per call) and with the shared client from clients.py, then reports
+latency percentiles and how many connections each opened.
+
+    python bench_clients.py --url https://api.openai.com/v1/models --requests 30
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import numpy as np
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.clients import _limits, _timeout, get_http_client, pool_stats
+
+
+async def timed(client: httpx.AsyncClient, url: str, headers) -> float:
+    start = time.perf_counter()
+    response = await client.get(url, headers=headers)
+    await response.aread()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(url: str, requests: int):
+    headers = {}
+    if os.getenv("OPENAI_API_KEY") and "openai.com" in url:
+        headers["Authorization"] = f"Bearer {os.environ['OPENAI_API_KEY']}"
+
+    fresh = []
+    for _ in range(requests):
+        async with httpx.AsyncClient(limits=_limits(), timeout=_timeout()) as client:
+            fresh.append(await timed(client, url, headers))
+
+    shared_client = get_http_client("bench")
+    await timed(shared_client, url, headers)  # open the pooled connection once
+    pooled = [await timed(shared_client, url, headers) for _ in range(requests)]
+
+    print(f"{'client':>8} {'p50 ms':>8} {'p90 ms':>8} {'mean ms':>8} {'conns':>6}")
+    print(f"{'fresh':>8} {np.percentile(fresh, 50):>8.1f} {np.percentile(fresh, 90):>8.1f} {np.mean(fresh):>8.1f} {requests:>6}")
+    stats = pool_stats()["bench"]
+    print(f"{'pooled':>8} {np.percentile(pooled, 50):>8.1f} {np.percentile(pooled, 90):>8.1f} {np.mean(pooled):>8.1f} {stats['connections_opened']:>6}")
+    print(f"Saved per request: {np.mean(fresh) - np.mean(pooled):.1f} ms (mean)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-request HTTP clients.")
+    parser.add_argument("--url", default="https://api.openai.com/v1/models")
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests))
@@ -0,0 +1,107 @@
+"""
+Benchmarks session stores on the A2rchi chat hot path.
+
+Each store is preloaded with N sessions (sender mapping, memory record and
+a few turns). Then it serves timed requests that do what handle_chat does:
+set the sender, load the session memory and append a question and answer.
+Reports p50/p99 request latency and disk use for the agent's default
+KeyValueStore, SQLiteSessionStore and LogSessionStore.
+
+    python bench_session_store.py --sessions 1000 10000 --requests 300
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from uagents.storage import KeyValueStore
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.session_store import LogSessionStore, SQLiteSessionStore
+from session_memory import SessionMemory, meta_key, turn_key
+
+TURNS_PER_SESSION = 6
+ANSWER = "A worked answer about Newton's second law, `F_net = m * a`. " * 20
+
+
+def session_records(n: int):
+    for s in range(n):
+        session = f"session-{s}"
+        yield session, f"agent1q{s:058d}"
+        yield meta_key(session), {"start": 0, "next": TURNS_PER_SESSION, "summary": "", "last_active": time.time()}
+        for t in range(TURNS_PER_SESSION):
+            role = "user" if t % 2 == 0 else "assistant"
+            yield turn_key(session, t), {"role": role, "content": ANSWER if role == "assistant" else "What is F = ma?"}
+
+
+def preload(kind: str, store, n: int):
+    if kind == "agent":
+        # Loading key by key would rewrite the JSON file every time
+        store._data.update(session_records(n))
+        store._save()
+    elif kind == "sqlite":
+        expires = time.time() + store.ttl
+        with store.db:
+            store.db.execute("BEGIN")
+            store.db.executemany(
+                "INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                ((k, json.dumps(v), expires) for k, v in session_records(n)),
+            )
+    else:
+        for k, v in session_records(n):
+            store.set(k, v)
+
+
+def open_store(kind: str, workdir: str):
+    if kind == "agent":
+        return KeyValueStore("bench", cwd=workdir)
+    if kind == "sqlite":
+        return SQLiteSessionStore(os.path.join(workdir, "sessions.sqlite3"))
+    return LogSessionStore(os.path.join(workdir, "sessions.log"))
+
+
+def disk_bytes(workdir: str) -> int:
+    return sum(os.path.getsize(os.path.join(workdir, f)) for f in os.listdir(workdir))
+
+
+def run(sizes, requests: int, kinds):
+    rng = random.Random(0)
+    print(f"{'sessions':>9} {'store':>7} {'p50 ms':>9} {'p99 ms':>9} {'disk MiB':>9}")
+    for n in sizes:
+        for kind in kinds:
+            workdir = tempfile.mkdtemp(prefix="bench_sessions_")
+            try:
+                store = open_store(kind, workdir)
+                preload(kind, store, n)
+
+                latencies = []
+                for _ in range(requests):
+                    session = f"session-{rng.randrange(n)}"
+                    start = time.perf_counter()
+                    store.set(session, "agent1qsender")
+                    memory = SessionMemory(store, session)
+                    memory.load()
+                    memory.append("user", "What is the moment of inertia of a rod?")
+                    memory.append("assistant", ANSWER)
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                print(
+                    f"{n:>9} {kind:>7} {np.percentile(latencies, 50):>9.2f} "
+                    f"{np.percentile(latencies, 99):>9.2f} {disk_bytes(workdir) / 2**20:>9.1f}"
+                )
+            finally:
+                shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark session store backends.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--stores", nargs="+", choices=["agent", "sqlite", "log"], default=["agent", "sqlite", "log"])
+    args = parser.parse_args()
+    run(args.sessions, args.requests, args.stores)
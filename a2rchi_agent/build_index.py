@@ -1,64 +1,291 @@
+import asyncio
 import os
 import shutil
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-def build_faiss_index(output_dir: str = "a2rchi_index"):
-    DATA_FOLDERS = {
-        "textbook": "data/textbook",
-    }
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.dedup import DEDUP_THRESHOLD, NearDuplicateFilter, dependent_sources, print_report
+from agent_common.embed_stage import EMBEDDING_MODEL, EmbeddingStage
+from agent_common.index_build import (
+    chunk_hash,
+    file_hash,
+    ingest_files,
+    load_manifest,
+    prepare_staging,
+    print_timings,
+    publish_index,
+)
+from agent_common.vector_index import ANN_BACKENDS, IndexWriter, MmapIndex, build_ann
+from lexical_index import build_lexical_index
+from page_cache import PAGE_CACHE_DIR, load_pages, prune, save_pages
 
-    docs = []
-    print("🔍 Scanning data folders...")
+DATA_FOLDERS = {
+    "textbook": "data/textbook",
+}
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
 
+def scan_files() -> Dict[str, dict]:
+    """Returns {source: {"path", "type", "sha256"}} for every indexable file."""
+    files = {}
+    print("🔍 Scanning data folders...")
     for doc_type, folder in DATA_FOLDERS.items():
         path = Path(folder)
         if not path.exists():
             print(f"⚠️ Skipping {folder} (not found)")
             continue
 
-        for file in os.listdir(path):
+        for file in sorted(os.listdir(path)):
             fpath = path / file
-            if file.endswith(".pdf"):
-                loader = PyPDFLoader(str(fpath))
-            elif file.endswith(".txt"):
-                loader = TextLoader(str(fpath))
-            else:
+            if not file.endswith((".pdf", ".txt")):
                 print(f"⛔ Skipping unsupported file: {fpath}")
                 continue
+            files[file] = {"path": str(fpath), "type": doc_type, "sha256": file_hash(fpath)}
+    return files
+
+def load_file(fpath: str, doc_type: str, sha256: Optional[str] = None, page_cache: Optional[str] = None) -> Tuple[List[Document], bool]:
+    """
+    Returns (pages, whether they came from the page cache). With page_cache
+    and sha256 set, a file parsed before is read back instead of re-parsed.
+    """
+    loaded = load_pages(page_cache, sha256) if page_cache and sha256 else None
+    cached = loaded is not None
+    if not cached:
+        if fpath.endswith(".pdf"):
+            loader = PyPDFLoader(fpath)
+        else:
+            loader = TextLoader(fpath)
 
-            print(f"📄 Loading {fpath}")
-            try:
-                loaded = loader.load()
-                for doc in loaded:
-                    doc.metadata["type"] = doc_type
-                    doc.metadata["source"] = file
-                docs.extend(loaded)
-            except Exception as e:
-                print(f"❌ Error loading {fpath}: {e}")
+        print(f"📄 Loading {fpath}")
+        loaded = loader.load()
+        if page_cache and sha256:
+            save_pages(page_cache, sha256, loaded)
 
-    print(f"✅ Loaded {len(docs)} documents.")
+    for doc in loaded:
+        doc.metadata["type"] = doc_type
+        doc.metadata["source"] = os.path.basename(fpath)
+    return loaded, cached
 
-    if not docs:
+def ingest_file(source: str, info: dict, page_cache: Optional[str]) -> Tuple[str, List[Document], float, bool]:
+    """Parses (or reads back from the page cache) and splits one file. Runs in a worker process."""
+    start = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    pages, cached = load_file(info["path"], info["type"], info["sha256"], page_cache)
+    return source, splitter.split_documents(pages), time.perf_counter() - start, cached
+
+def stored_vectors(index: MmapIndex, positions: Dict[str, int], ids: Dict[str, str]) -> Dict[str, list]:
+    """Maps chunk hash -> stored embedding for the given {doc_id: chunk_hash}."""
+    vectors = {}
+    for doc_id, h in ids.items():
+        if doc_id in positions and h not in vectors:
+            vectors[h] = index.vectors[positions[doc_id]].tolist()
+    return vectors
+
+def build_faiss_index(
+    output_dir: str = "a2rchi_index",
+    full: bool = False,
+    workers: Optional[int] = None,
+    batch_size: int = 256,
+    max_in_flight: int = 4,
+    ann: str = "flat",
+    page_cache: Optional[str] = PAGE_CACHE_DIR,
+    dedup_threshold: float = DEDUP_THRESHOLD,
+):
+    """
+    Builds or updates the index. Only new or changed files are parsed, and
+    only chunks whose text isn't already in the index are embedded. Files
+    are parsed in a process pool and each file's chunks are queued for
+    embedding as soon as it finishes, in one embedding run shared by all
+    files. ann picks the search backend (see vector_index.build_ann).
+    A BM25 index over the chunk texts is rebuilt alongside for hybrid retrieval.
+    Extracted page text is kept in page_cache (None disables it), so
+    re-chunking with new settings doesn't parse any PDF again. Chunks that
+    near-duplicate an earlier one (MinHash similarity >= dedup_threshold,
+    0 disables) are left out, and a file whose dropped chunks repeated a
+    changed or removed file is filtered again so they come back if needed.
+    """
+    timings = {}
+    start = time.perf_counter()
+    files = scan_files()
+    timings["scan"] = time.perf_counter() - start
+    if not files:
         print("❌ No documents to index. Aborting.")
         return
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(docs)
-    print(f"🧩 Split into {len(chunks)} chunks.")
+    start = time.perf_counter()
+    splitter = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    manifest = None if full else load_manifest(output_dir, "splitter", splitter, "♻️ Chunking settings changed, rebuilding from scratch.")
+    old_index = None
+    positions = {}
+    if manifest is not None:
+        try:
+            old_index = MmapIndex(output_dir)
+            positions = {record["id"]: i for i, record in enumerate(old_index.records())}
+        except Exception as e:
+            print(f"⚠️ Couldn't load existing index ({e}), rebuilding from scratch.")
+            manifest = None
+    if manifest is None:
+        manifest = {"splitter": splitter, "files": {}}
 
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-        print(f"🧹 Cleared old index at {output_dir}")
+    indexed = manifest["files"]
+    if manifest.get("dedup_threshold") != dedup_threshold:
+        # Re-filter every file; vectors of surviving chunks are reused below
+        if indexed:
+            print("♻️ Dedup threshold changed, re-filtering all files.")
+        indexed_hashes = {}
+        manifest["dedup_threshold"] = dedup_threshold
+    else:
+        indexed_hashes = {s: info["sha256"] for s, info in indexed.items()}
+    changed = {s: info for s, info in files.items() if indexed_hashes.get(s) != info["sha256"]}
+    removed = [s for s in indexed if s not in files]
+    print(f"🧾 {len(files) - len(changed)} unchanged, {len(changed)} new or changed, {len(removed)} removed.")
+    # Chunks dropped as near-duplicates are only in the index through their kept copy
+    refiltered = dependent_sources(indexed, list(changed) + removed)
+    if refiltered:
+        print(f"♻️ Re-filtering {len(refiltered)} unchanged files whose near-duplicates were kept in a changed or removed file.")
+        changed.update((s, files[s]) for s in refiltered)
 
-    vectorstore = FAISS.from_documents(chunks, OpenAIEmbeddings())
-    vectorstore.save_local(output_dir)
-    print(f"✅ FAISS index saved to '{output_dir}' with {len(chunks)} chunks.")
+    current_ann = (old_index.meta.get("ann") or {}).get("backend", "flat") if old_index is not None else None
+    if not changed and not removed and current_ann == ann:
+        print(f"✅ Index at '{output_dir}' is up to date.")
+        return
+
+    # Keep vectors of changed/removed files around for chunks that didn't change
+    stale = {}
+    for source in list(changed) + removed:
+        for chunk in indexed.get(source, {}).get("chunks", []):
+            stale[chunk["id"]] = chunk["hash"]
+    reusable = stored_vectors(old_index, positions, stale) if old_index is not None else {}
+    for source in removed:
+        del indexed[source]
+
+    # Copy rows of unchanged files straight across; new chunks are checked against them
+    staging_dir = prepare_staging(output_dir)
+    writer = IndexWriter(staging_dir, EMBEDDING_MODEL)
+    dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+    if old_index is not None:
+        for source, info in indexed.items():
+            if source in changed:
+                continue
+            rows = [positions[c["id"]] for c in info["chunks"] if c["id"] in positions]
+            records = [old_index.record(i) for i in rows]
+            writer.add(old_index.vectors[rows], records)
+            if dedup is not None:
+                for record in records:
+                    dedup.add(record["text"], source)
+    timings["load index"] = time.perf_counter() - start
+
+    # Survives an interrupted run, so the next run only embeds what's left
+    stage = EmbeddingStage(
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        checkpoint_path=f"{output_dir}.checkpoint.jsonl",
+    )
+    timings["parse (cpu)"] = 0.0
+    counts = {"chunks": 0, "embedded": 0, "from_cache": 0}
+
+    def parsed_files():
+        """Chunks of each changed file, after dedup, with the texts that still need embedding. Runs in a worker thread."""
+        for source, chunks, seconds, cached in ingest_files(
+            ingest_file, {s: (info, page_cache) for s, info in changed.items()}, workers, failed=(False,)
+        ):
+            timings["parse (cpu)"] += seconds
+            counts["from_cache"] += cached
+            if chunks is None:
+                indexed.pop(source, None)
+                continue
+
+            ids = [f"{source}#{i}" for i in range(len(chunks))]
+            duplicates, copies_of = 0, set()
+            if dedup is not None:
+                kept, copies_of = dedup.filter_labeled((c.page_content for c in chunks), source)
+                duplicates = len(chunks) - len(kept)
+                ids, chunks = [ids[i] for i in kept], [chunks[i] for i in kept]
+            hashes = [chunk_hash(c.page_content) for c in chunks]
+            indexed[source] = {
+                "sha256": changed[source]["sha256"],
+                "chunks": [{"id": i, "hash": h} for i, h in zip(ids, hashes)],
+            }
+            if copies_of - {source}:
+                indexed[source]["copies_of"] = sorted(copies_of - {source})
+            to_embed = sorted({h: c.page_content for h, c in zip(hashes, chunks) if h not in reusable}.items())
+            yield (source, ids, chunks, hashes, duplicates, [h for h, _ in to_embed]), [text for _, text in to_embed]
+
+    async def embed_files():
+        # Every file's chunks go through one stage run, so batches fill across
+        # files and the in-flight cap and rate limit backoff carry over. A file
+        # is written to the index once its last batch is checkpointed.
+        async for (source, ids, chunks, hashes, duplicates, new_hashes), vectors in stage.embed_stream(parsed_files()):
+            reusable.update(zip(new_hashes, vectors))
+            writer.add(
+                [reusable[h] for h in hashes],
+                [{"id": i, "text": c.page_content, "metadata": c.metadata} for i, c in zip(ids, chunks)],
+            )
+            counts["chunks"] += len(chunks)
+            counts["embedded"] += len(new_hashes)
+            print(f"🧩 {source}: {len(chunks)} chunks, {len(new_hashes)} embedded, {duplicates} near-duplicates dropped.")
+
+    start = time.perf_counter()
+    asyncio.run(embed_files())
+    timings["ingest wall"] = time.perf_counter() - start
+    print(f"🧩 {counts['chunks']} chunks from changed files, {counts['embedded']} needed embedding.")
+    if dedup is not None:
+        print_report(dedup)
+    if page_cache:
+        print(f"📦 {counts['from_cache']}/{len(changed)} files read from the page cache.")
+
+    writer.close()
+    if not writer.count:
+        shutil.rmtree(staging_dir)
+        print("❌ No documents to index. Aborting.")
+        return
+
+    start = time.perf_counter()
+    build_lexical_index(staging_dir)
+    timings["bm25"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if ann != "flat":
+        build_ann(staging_dir, ann)
+        timings["ann"] = time.perf_counter() - start
+        start = time.perf_counter()
+    # Release the old index's memory maps before its directory is replaced
+    if old_index is not None:
+        old_index.close()
+    publish_index(staging_dir, output_dir, manifest)
+    stage.clear_checkpoint()
+    if page_cache:
+        removed = prune(page_cache, (info["sha256"] for info in files.values()))
+        if removed:
+            print(f"🧹 Removed {removed} stale page cache entries")
+    timings["save"] = time.perf_counter() - start
+    print(f"✅ Index saved to '{output_dir}' with {writer.count} chunks.")
+    print_timings(timings)
 
 if __name__ == "__main__":
-    build_faiss_index()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or update the A2rchi vector index.")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-embed everything")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=256, help="texts per embedding request")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="concurrent embedding requests")
+    parser.add_argument("--ann", choices=ANN_BACKENDS, default="flat", help="search backend (default: exact)")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD, help="near-duplicate similarity to drop at (0 disables)")
+    parser.add_argument("--page-cache", default=PAGE_CACHE_DIR, help="parsed page text cache directory ('' to disable)")
+    args = parser.parse_args()
+    build_faiss_index(
+        full=args.full,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+        ann=args.ann,
+        page_cache=args.page_cache or None,
+        dedup_threshold=args.dedup_threshold,
+    )
@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from uuid import uuid4
 
@@ -6,14 +7,28 @@ from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
     EndSessionContent,
+    EndStreamContent,
     StartSessionContent,
+    StartStreamContent,
     TextContent,
     chat_protocol_spec,
 )
 
-from a2rchi import answer_physics_question
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.session_store import open_session_store
+from agent_common.warmup import is_ready, wait_until_ready
+from a2rchi import ANSWER_DEADLINE, answer_physics_question, stream_physics_answer, summarize_turns
+from deadline import Deadline
+from session_memory import SessionMemory
 
-HISTORY_KEY = lambda session: f"{session}:history"
+# Send answers in pieces as the LLM produces them, instead of all at once
+STREAM_RESPONSES = os.getenv("A2RCHI_STREAM", "1") != "0"
+
+# Session data lives here unless SESSION_STORE=agent selects ctx.storage
+session_store = open_session_store()
+
+def get_session_storage(ctx: Context):
+    return session_store if session_store is not None else ctx.storage
 
 # Create the chat protocol using the standard chat spec
 chat_proto = Protocol(spec=chat_protocol_spec)
@@ -29,12 +44,26 @@ def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
         content=content,
     )
 
+# Streamed answers share a stream id: the first part opens the stream and a
+# final message with no text closes it, so clients know the answer is complete
+def create_stream_chat(stream_id, text: str = "", start: bool = False, end: bool = False) -> ChatMessage:
+    content = []
+    if start:
+        content.append(StartStreamContent(type="start-stream", stream_id=stream_id))
+    if text:
+        content.append(TextContent(type="text", text=text))
+    if end:
+        content.append(EndStreamContent(type="end-stream", stream_id=stream_id))
+    return ChatMessage(
+        timestamp=datetime.utcnow(),
+        msg_id=uuid4(),
+        content=content,
+    )
+
 # Required: handle incoming chat messages
 @chat_proto.on_message(model=ChatMessage)
 async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
     ctx.logger.info(f"📩 Received ChatMessage from {sender}")
-    ctx.storage.set(str(ctx.session), sender)
-
     # Acknowledge receipt
     await ctx.send(
         sender,
@@ -44,9 +73,17 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
         ),
     )
 
-    # Load history from storage
-    history_key = HISTORY_KEY(ctx.session)
-    history = ctx.storage.get(history_key) or []
+    # A question that arrives during warmup waits for it; the answer's
+    # latency budget only starts once the agent is ready
+    if not is_ready():
+        ctx.logger.info("⏳ Waiting for warmup to finish")
+        await wait_until_ready()
+    deadline = Deadline(ANSWER_DEADLINE)
+    storage = get_session_storage(ctx)
+    storage.set(str(ctx.session), sender)
+
+    # Load recent turns and the summary of older ones
+    memory = SessionMemory(storage, ctx.session, legacy_storage=ctx.storage)
 
     for item in msg.content:
         if isinstance(item, StartSessionContent):
@@ -56,15 +93,29 @@ async def handle_chat(ctx: Context, sender: str, msg: ChatMessage):
             question = item.text
             ctx.logger.info(f"🧠 User asked: {question}")
 
-            response = await answer_physics_question(question, ctx, history)
-            await ctx.send(sender, create_text_chat(response))
+            summary, history = memory.load()
+            if STREAM_RESPONSES:
+                stream_id = uuid4()
+                parts = []
+                async for part in stream_physics_answer(question, ctx, history, summary, deadline=deadline):
+                    await ctx.send(sender, create_stream_chat(stream_id, part, start=not parts))
+                    parts.append(part)
+                await ctx.send(sender, create_stream_chat(stream_id, start=not parts, end=True))
+                response = "".join(parts)
+            else:
+                response = await answer_physics_question(question, ctx, history, summary, deadline=deadline)
+                await ctx.send(sender, create_text_chat(response))
 
             # Append user question and assistant reply
-            history.append({"role": "user", "content": question})
-            history.append({"role": "assistant", "content": response})
+            memory.append("user", question)
+            memory.append("assistant", response)
 
-            # Save back to session storage
-            ctx.storage.set(history_key, history)
+            # Fold old turns into the summary once the reply is out
+            if memory.needs_compaction():
+                try:
+                    await memory.compact(summarize_turns)
+                except Exception as e:
+                    ctx.logger.error(f"❌ Failed to compact session memory: {e}")
 
         else:
             ctx.logger.info(f"⚠️ Ignoring unknown content type from {sender}")
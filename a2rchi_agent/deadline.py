@@ -0,0 +1,69 @@
+"""
+Per-request latency budget.
+
+A Deadline is created when a question arrives and handed to every stage
+of the answer (embedding, retrieval, generation). Each stage runs inside
+deadline.stage(name), which records how long it took, and asks
+remaining() how much time it may still use. summary() gives the per-stage
+breakdown for the log line written once the answer is out.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.start = time.perf_counter()
+        self.expires = self.start + seconds
+        self.timings: Dict[str, float] = {}
+        self.degraded = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.perf_counter())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def degrade(self, reason: str):
+        """Records a fallback taken to stay within the budget."""
+        self.degraded.append(reason)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    async def run(self, name: str, awaitable: Awaitable[T], limit: Optional[float] = None) -> T:
+        """
+        Awaits within the time left (or limit, if smaller) as stage name.
+        Raises DeadlineExceeded if it doesn't finish in time.
+        """
+        timeout = self.remaining() if limit is None else min(limit, self.remaining())
+        with self.stage(name):
+            try:
+                return await asyncio.wait_for(awaitable, timeout)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"{name} did not finish within {timeout:.1f}s") from None
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in self.timings.items())
+        text = f"{self.elapsed():.2f}s of {self.budget:g}s budget ({stages})"
+        if self.degraded:
+            text += f"; degraded: {', '.join(self.degraded)}"
+        return text
@@ -1,22 +1,209 @@
+"""
+Downloads the 8.01 textbook chapters listed in 801-textbook.list.
+
+Lines are "<url>" or "<url> <sha256>"; blank lines and # comments are
+skipped. Downloads run concurrently (--concurrency) and stream to a
+.part file that is renamed into place only once it is complete and
+verified, so an interrupted run never leaves a truncated PDF behind.
+
+A state file (.downloads.json in the destination) records each file's
+ETag, Last-Modified and sha256:
+    - an unchanged file is skipped with a conditional request (304)
+    - a .part file left by an interrupted run is resumed with a Range request
+    - a file that no longer matches its recorded or listed sha256 is fetched again
+
+    python download_textbooks.py --dest data/textbook --concurrency 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
 import os
-import requests
-
-# Path to your .list file
-with open("801-textbook.list", "r") as f:
-    urls = [
-        line.strip()
-        for line in f
-        if line.strip() and not line.startswith("#")
-    ]
-
-save_dir = "data/801"
-os.makedirs(save_dir, exist_ok=True)
-
-for url in urls:
-    filename = url.split("/")[-1]
-    print(f"Downloading {filename}...")
-    r = requests.get(url)
-    with open(os.path.join(save_dir, filename), "wb") as f:
-        f.write(r.content)
-
-print("✅ All chapters downloaded to:", save_dir)
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+
+LIST_FILE = "801-textbook.list"
+SAVE_DIR = "data/801"
+STATE_FILE = ".downloads.json"
+MAX_CONCURRENT = 4
+RETRIES = 3
+CHUNK_BYTES = 1 << 16
+
+
+@dataclass
+class Entry:
+    url: str
+    sha256: Optional[str] = None
+
+    @property
+    def filename(self) -> str:
+        return self.url.rstrip("/").split("/")[-1]
+
+
+def read_list(path: str = LIST_FILE) -> List[Entry]:
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            url, _, checksum = line.partition(" ")
+            entries.append(Entry(url, checksum.strip().lower() or None))
+    return entries
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DownloadState:
+    """Per-file validators and checksums, saved atomically after every change."""
+
+    def __init__(self, save_dir: str):
+        self.path = os.path.join(save_dir, STATE_FILE)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files: Dict[str, dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.files = {}
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.files, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def validators(response: httpx.Response) -> dict:
+    return {k: response.headers[h] for k, h in (("etag", "ETag"), ("last_modified", "Last-Modified")) if h in response.headers}
+
+
+async def download(client: httpx.AsyncClient, entry: Entry, save_dir: str, state: DownloadState) -> str:
+    """
+    Fetches one file if needed. Returns "unchanged", "downloaded" or
+    "resumed". Raises on HTTP errors or a checksum mismatch.
+    """
+    final = os.path.join(save_dir, entry.filename)
+    part = f"{final}.part"
+    record = state.files.get(entry.filename, {})
+
+    # Byte ranges and lengths must refer to the file itself, not a compressed body
+    headers = {"Accept-Encoding": "identity"}
+    if os.path.exists(final):
+        local = file_sha256(final)
+        expected = entry.sha256 or record.get("sha256")
+        if local == expected:
+            if "etag" in record:
+                headers["If-None-Match"] = record["etag"]
+            if "last_modified" in record:
+                headers["If-Modified-Since"] = record["last_modified"]
+
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    partial = record.get("partial") or {}
+    if offset and partial.get("url") == entry.url and (partial.get("etag") or partial.get("last_modified")):
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = partial.get("etag") or partial["last_modified"]
+    else:
+        offset = 0
+
+    async with client.stream("GET", entry.url, headers=headers) as response:
+        if response.status_code == 304:
+            return "unchanged"
+        if response.status_code == 416:
+            os.remove(part)
+            raise IOError("stale partial download discarded")
+        response.raise_for_status()
+
+        resumed = response.status_code == 206
+        if not resumed:
+            offset = 0
+        record["partial"] = {"url": entry.url, **validators(response)}
+        state.files[entry.filename] = record
+        state.save()
+
+        h = hashlib.sha256()
+        if resumed:
+            with open(part, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        with open(part, "ab" if resumed else "wb") as f:
+            async for chunk in response.aiter_bytes(CHUNK_BYTES):
+                f.write(chunk)
+                h.update(chunk)
+
+        size = os.path.getsize(part)
+        expected_size = response.headers.get("Content-Length")
+        if expected_size is not None and size != offset + int(expected_size):
+            raise IOError(f"got {size - offset} of {expected_size} bytes")
+
+    digest = h.hexdigest()
+    if entry.sha256 and digest != entry.sha256:
+        os.remove(part)
+        record.pop("partial", None)
+        state.save()
+        raise ValueError(f"sha256 {digest} does not match listed {entry.sha256}")
+
+    os.replace(part, final)
+    state.files[entry.filename] = {"url": entry.url, "sha256": digest, **record.pop("partial")}
+    state.save()
+    return "resumed" if resumed else "downloaded"
+
+
+async def download_with_retries(client, entry: Entry, save_dir: str, state: DownloadState, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        for attempt in range(1, RETRIES + 1):
+            try:
+                status = await download(client, entry, save_dir, state)
+                print(f"{'✅' if status != 'unchanged' else '⏭️'} {entry.filename}: {status}")
+                return status
+            except (httpx.TransportError, IOError) as e:
+                # The .part file is kept, so the next attempt resumes
+                if attempt == RETRIES:
+                    print(f"❌ {entry.filename}: {e}")
+                    return "failed"
+                await asyncio.sleep(2 ** attempt)
+            except (httpx.HTTPStatusError, ValueError) as e:
+                print(f"❌ {entry.filename}: {e}")
+                return "failed"
+
+
+async def download_all(
+    entries: List[Entry],
+    save_dir: str = SAVE_DIR,
+    concurrency: int = MAX_CONCURRENT,
+    client: Optional[httpx.AsyncClient] = None,
+) -> Dict[str, str]:
+    """Downloads every entry, at most concurrency at a time. Returns {filename: status}."""
+    os.makedirs(save_dir, exist_ok=True)
+    state = DownloadState(save_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(60, connect=10))
+    try:
+        statuses = await asyncio.gather(
+            *(download_with_retries(client, entry, save_dir, state, semaphore) for entry in entries)
+        )
+    finally:
+        if own_client:
+            await client.aclose()
+    return {entry.filename: status for entry, status in zip(entries, statuses)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the 8.01 textbook chapters.")
+    parser.add_argument("--list", default=LIST_FILE, help="file of '<url> [sha256]' lines")
+    parser.add_argument("--dest", default=SAVE_DIR)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT)
+    args = parser.parse_args()
+
+    results = asyncio.run(download_all(read_list(args.list), args.dest, args.concurrency))
+    counts = {s: list(results.values()).count(s) for s in ("downloaded", "resumed", "unchanged", "failed")}
+    print(f"✅ Chapters in {args.dest}: " + ", ".join(f"{n} {s}" for s, n in counts.items()))
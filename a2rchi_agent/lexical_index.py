@@ -0,0 +1,189 @@
+"""
+BM25 inverted index stored next to a vector index.
+
+Embedding similarity over short chunks sometimes misses questions that
+hinge on exact terms ("Atwood machine", "moment of inertia"). This index
+scores chunks by those terms, and hybrid retrieval fuses its ranking with
+the vector ranking. It lives in the same directory as the vector index:
+    lexical.json         BM25 parameters and {term: [start, end]} into the postings
+    lexical.rows.u32     row of each posting, grouped by term
+    lexical.weights.f32  precomputed BM25 weight of each posting
+
+Postings are memory-mapped, and a query only reads the ranges of its own
+terms.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+
+LEXICAL_FILE = "lexical.json"
+ROWS_FILE = "lexical.rows.u32"
+WEIGHTS_FILE = "lexical.weights.f32"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant; higher flattens the difference between ranks
+RRF_K = 60
+
+_word = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from how i if in into is it its "
+    "me my of on or our so than that the their them then there these this those to was "
+    "we what when where which while who why will with would you your".split()
+)
+
+
+def stem(word: str) -> str:
+    """Folds simple plurals ("machines" -> "machine") so they match their singular."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(w) for w in _word.findall(text.lower()) if w not in STOPWORDS]
+
+
+def build_lexical_index(index_dir: str, k1: float = BM25_K1, b: float = BM25_B):
+    """Builds the BM25 index over the chunk texts of a finished index directory."""
+    from agent_common.vector_index import MmapIndex
+
+    index = MmapIndex(index_dir)
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    lengths = np.zeros(len(index), dtype=np.float32)
+    for row, record in enumerate(index.records()):
+        terms = tokenize(record["text"])
+        lengths[row] = len(terms)
+        for term, tf in Counter(terms).items():
+            postings[term].append((row, tf))
+
+    n = len(index)
+    avgdl = float(lengths.mean()) if n else 0.0
+    vocab = {}
+    rows, weights = [], []
+    offset = 0
+    for term in sorted(postings):
+        plist = postings[term]
+        df = len(plist)
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        term_rows = np.fromiter((r for r, _ in plist), dtype=np.uint32, count=df)
+        tf = np.fromiter((t for _, t in plist), dtype=np.float32, count=df)
+        norm = k1 * (1 - b + b * lengths[term_rows] / max(avgdl, 1e-9))
+        vocab[term] = [offset, offset + df]
+        offset += df
+        rows.append(term_rows)
+        weights.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+
+    (np.concatenate(rows) if rows else np.zeros(0, np.uint32)).tofile(os.path.join(index_dir, ROWS_FILE))
+    (np.concatenate(weights) if weights else np.zeros(0, np.float32)).tofile(os.path.join(index_dir, WEIGHTS_FILE))
+    with open(os.path.join(index_dir, LEXICAL_FILE), "w", encoding="utf-8") as f:
+        json.dump({"count": n, "k1": k1, "b": b, "avgdl": avgdl, "vocab": vocab}, f)
+    print(f"🔤 Built BM25 index over {n} chunks ({len(vocab)} terms)")
+
+
+class LexicalIndex:
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, LEXICAL_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.vocab: Dict[str, List[int]] = meta["vocab"]
+        total = os.path.getsize(os.path.join(index_dir, ROWS_FILE)) // 4
+        if total:
+            self.rows = np.memmap(os.path.join(index_dir, ROWS_FILE), dtype=np.uint32, mode="r", shape=(total,))
+            self.weights = np.memmap(os.path.join(index_dir, WEIGHTS_FILE), dtype=np.float32, mode="r", shape=(total,))
+        else:
+            self.rows = np.zeros(0, np.uint32)
+            self.weights = np.zeros(0, np.float32)
+
+    @classmethod
+    def open(cls, index_dir: str) -> Optional["LexicalIndex"]:
+        """Returns None for an index built before lexical indexes existed."""
+        if not os.path.exists(os.path.join(index_dir, LEXICAL_FILE)):
+            return None
+        return cls(index_dir)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def idf(self, term: str) -> float:
+        start, end = self.vocab.get(term, (0, 0))
+        df = end - start
+        return math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Returns (BM25 score per row, idf mass of the query terms each row
+        contains, idf mass of all query terms).
+        """
+        scores = np.zeros(self.count, dtype=np.float32)
+        matched = np.zeros(self.count, dtype=np.float32)
+        total = 0.0
+        for term in set(tokenize(query)):
+            idf = self.idf(term)
+            total += idf
+            if term not in self.vocab:
+                continue
+            start, end = self.vocab[term]
+            rows = self.rows[start:end]
+            scores[rows] += self.weights[start:end]
+            matched[rows] += idf
+        return scores, matched, total
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Returns up to k (row, BM25 score) pairs with a non-zero score, best first."""
+        scores, _, _ = self.score(query)
+        return _top(scores, k)
+
+    def confident_search(
+        self, query: str, k: int, coverage: float, min_hits: int, min_idf: float
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Lexical results if the query's keywords alone are a strong enough
+        signal: its terms carry at least min_idf in total, and at least
+        min_hits chunks contain terms worth `coverage` of that. Otherwise None.
+        """
+        scores, matched, total = self.score(query)
+        if total < min_idf:
+            return None
+        strong = matched >= coverage * total
+        if int(strong.sum()) < min_hits:
+            return None
+        return _top(np.where(strong, scores, 0.0), k)
+
+
+def _top(scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    k = min(k, int(np.count_nonzero(scores)))
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(i), float(scores[i])) for i in top]
+
+
+def fuse_rankings(rankings: Sequence[Sequence[int]], k: int, weights: Optional[Sequence[float]] = None) -> List[int]:
+    """Reciprocal rank fusion of several best-first row rankings. Returns the top k rows."""
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, row in enumerate(ranking):
+            fused[row] += weight / (RRF_K + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:k]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the BM25 index for an existing index directory.")
+    parser.add_argument("index_dir")
+    args = parser.parse_args()
+    build_lexical_index(args.index_dir)
@@ -0,0 +1,55 @@
+"""
+Cache of text extracted from source files, keyed by file content hash.
+
+Parsing PDFs dominates index rebuilds, and a new chunk_size or
+chunk_overlap doesn't change the extracted text. Each parsed file is
+stored as gzipped JSONL, one {"text", "metadata"} line per page, under
+{sha256}.v{PARSER_VERSION}.jsonl.gz. A file whose content hash has an
+entry is never parsed again. Bump PARSER_VERSION when extraction changes.
+"""
+
+import gzip
+import json
+import os
+from typing import Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+PAGE_CACHE_DIR = "page_cache"
+PARSER_VERSION = 1
+
+
+def cache_path(cache_dir: str, sha256: str) -> str:
+    return os.path.join(cache_dir, f"{sha256}.v{PARSER_VERSION}.jsonl.gz")
+
+
+def load_pages(cache_dir: str, sha256: str) -> Optional[List[Document]]:
+    try:
+        with gzip.open(cache_path(cache_dir, sha256), "rt", encoding="utf-8") as f:
+            return [Document(page_content=page["text"], metadata=page["metadata"]) for page in map(json.loads, f)]
+    except (FileNotFoundError, EOFError, OSError, json.JSONDecodeError):
+        return None
+
+
+def save_pages(cache_dir: str, sha256: str, pages: List[Document]):
+    """Writes to a temp file and renames it, so parallel workers never see a partial entry."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, sha256)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        for page in pages:
+            f.write(json.dumps({"text": page.page_content, "metadata": page.metadata}, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def prune(cache_dir: str, keep: Iterable[str]) -> int:
+    """Deletes entries whose hash isn't in keep, or from older parser versions. Returns how many."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    wanted = {os.path.basename(cache_path(cache_dir, h)) for h in keep}
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name not in wanted:
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
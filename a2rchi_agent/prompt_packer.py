@@ -0,0 +1,131 @@
+"""
+Fits retrieved chunks and conversation history into a token budget.
+
+Chunks are taken in retrieval order and history exchanges (a user turn and
+the reply to it) by a mix of recency and word overlap with the question.
+Anything that doesn't fit is dropped whole, never cut mid-way.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+import tiktoken
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("A2RCHI_PROMPT_BUDGET", "4000"))
+# Most of the budget history may take before context gets the rest
+HISTORY_SHARE = float(os.getenv("A2RCHI_HISTORY_SHARE", "0.35"))
+# How many recent turns are considered at all
+HISTORY_CANDIDATE_TURNS = 20
+RECENCY_DECAY = 0.8
+
+_encoding = tiktoken.encoding_for_model("gpt-4o")
+_word = re.compile(r"[a-z0-9_]+")
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding.encode(text))
+
+
+@dataclass
+class PackedPrompt:
+    context: str
+    chat_history: str
+    tokens: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        return ", ".join(f"{k} {v}" for k, v in self.tokens.items())
+
+
+def format_turn(turn: Dict[str, str]) -> str:
+    role = "User" if turn["role"] == "user" else "A2rchi"
+    return f"{role}: {turn['content']}"
+
+
+def group_exchanges(history: Sequence[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+    exchanges: List[List[Dict[str, str]]] = []
+    for turn in history:
+        if turn["role"] == "user" or not exchanges:
+            exchanges.append([turn])
+        else:
+            exchanges[-1].append(turn)
+    return exchanges
+
+
+def _overlap(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def pack_prompt(
+    question: str,
+    template_tokens: int,
+    chunks: Sequence[str],
+    history: Sequence[Dict[str, str]],
+    summary: str = "",
+    budget: int = PROMPT_TOKEN_BUDGET,
+    history_share: float = HISTORY_SHARE,
+) -> PackedPrompt:
+    """
+    chunks are chunk texts, most relevant first. template_tokens is the
+    size of the prompt template with every field empty. summary, the
+    rolling summary of older turns, goes first in the history if it fits.
+    """
+    question_tokens = count_tokens(question)
+    remaining = max(0, budget - template_tokens - question_tokens)
+    history_budget = int(remaining * history_share)
+    history_used = 0
+
+    summary_text = f"Summary of earlier conversation: {summary}" if summary else ""
+    if summary_text:
+        summary_tokens = count_tokens(summary_text) + 1
+        if summary_tokens <= history_budget:
+            history_used = summary_tokens
+        else:
+            summary_text = ""
+
+    # History: best-scoring exchanges within its share, kept in order
+    exchanges = group_exchanges(history[-HISTORY_CANDIDATE_TURNS:])
+    question_words = set(_word.findall(question.lower()))
+    scored = []
+    for age, exchange in enumerate(reversed(exchanges)):
+        text = "\n".join(format_turn(t) for t in exchange)
+        score = RECENCY_DECAY ** age + 0.5 * _overlap(question_words, set(_word.findall(text.lower())))
+        scored.append((score, len(exchanges) - 1 - age, text, count_tokens(text) + 1))
+
+    kept_exchanges = []
+    for score, position, text, tokens in sorted(scored, reverse=True):
+        if history_used + tokens <= history_budget:
+            kept_exchanges.append((position, text))
+            history_used += tokens
+    chat_history = "\n".join(([summary_text] if summary_text else []) + [text for _, text in sorted(kept_exchanges)])
+
+    # Context: chunks in relevance order with whatever is left
+    context_budget = remaining - history_used
+    context_used = 0
+    kept_chunks = []
+    for chunk in chunks:
+        text = chunk.strip()
+        tokens = count_tokens(text) + 1
+        if context_used + tokens <= context_budget:
+            kept_chunks.append(text)
+            context_used += tokens
+
+    packed = PackedPrompt(
+        context="\n\n".join(kept_chunks),
+        chat_history=chat_history,
+        tokens={
+            "template": template_tokens,
+            "question": question_tokens,
+            "context": context_used,
+            "history": history_used,
+            "total": template_tokens + question_tokens + context_used + history_used,
+            "budget": budget,
+        },
+    )
+    logging.info(
+        f"🧮 Packed prompt: {packed.summary()} "
+        f"({len(kept_chunks)}/{len(chunks)} chunks, {len(kept_exchanges)}/{len(exchanges)} exchanges)"
+    )
+    return packed
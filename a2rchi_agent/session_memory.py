@@ -0,0 +1,142 @@
+"""
+Bounded conversation memory for A2rchi sessions.
+
+Each turn is stored under its own key, next to a small meta record with the
+turn counters, a rolling summary of compacted turns and the last activity
+time. Appending a turn writes that turn and the meta record only. Once more
+than HISTORY_WINDOW_TURNS + COMPACT_BATCH_TURNS turns are stored, the oldest
+are folded into the summary and deleted. Sessions idle for longer than
+SESSION_IDLE_TTL are removed by expire_idle_sessions().
+
+storage is anything with get/set/remove, such as ctx.storage or a
+session_store backend. Backends that expire keys themselves
+(handles_expiry) skip the session registry used for the sweep. When
+storage replaces ctx.storage, pass ctx.storage as legacy_storage so
+sessions kept there (per-turn keys or an old whole-list history) are
+moved across the first time they're loaded.
+"""
+
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+HISTORY_WINDOW_TURNS = 20
+COMPACT_BATCH_TURNS = 6
+SESSION_IDLE_TTL = float(os.getenv("A2RCHI_SESSION_TTL", str(7 * 24 * 3600)))
+SESSIONS_KEY = "sessions"
+
+Turn = Dict[str, str]
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+def meta_key(session: str) -> str:
+    return f"{session}:memory"
+
+
+def turn_key(session: str, n: int) -> str:
+    return f"{session}:turn:{n}"
+
+
+def legacy_history_key(session: str) -> str:
+    return f"{session}:history"
+
+
+class SessionMemory:
+    def __init__(self, storage, session: str, legacy_storage=None):
+        self.storage = storage
+        self.session = str(session)
+        self.meta = storage.get(meta_key(self.session))
+        if self.meta is None:
+            self.meta = {"start": 0, "next": 0, "summary": "", "last_active": time.time()}
+            if not getattr(storage, "handles_expiry", False):
+                self._register()
+            legacy = legacy_storage if legacy_storage is not None else storage
+            if legacy is not storage and legacy.get(meta_key(self.session)) is not None:
+                self._import_legacy_turns(legacy)
+            else:
+                self._import_legacy_history(legacy)
+
+    def _register(self):
+        sessions = self.storage.get(SESSIONS_KEY) or []
+        if self.session not in sessions:
+            sessions.append(self.session)
+            self.storage.set(SESSIONS_KEY, sessions)
+
+    def _import_legacy_history(self, legacy):
+        """Moves a pre-existing whole-list history into per-turn keys."""
+        history = legacy.get(legacy_history_key(self.session))
+        if not history:
+            self.storage.set(meta_key(self.session), self.meta)
+            return
+        for turn in history:
+            self.storage.set(turn_key(self.session, self.meta["next"]), turn)
+            self.meta["next"] += 1
+        self.storage.set(meta_key(self.session), self.meta)
+        legacy.remove(legacy_history_key(self.session))
+
+    def _import_legacy_turns(self, legacy):
+        """Moves a session's per-turn keys and meta record over from another store."""
+        self.meta = legacy.get(meta_key(self.session))
+        for n in range(self.meta["start"], self.meta["next"]):
+            turn = legacy.get(turn_key(self.session, n))
+            if turn is not None:
+                self.storage.set(turn_key(self.session, n), turn)
+        self.storage.set(meta_key(self.session), self.meta)
+        SessionMemory(legacy, self.session).clear()
+
+    @property
+    def summary(self) -> str:
+        return self.meta["summary"]
+
+    def turns(self) -> List[Turn]:
+        start = max(self.meta["start"], self.meta["next"] - HISTORY_WINDOW_TURNS)
+        turns = (self.storage.get(turn_key(self.session, n)) for n in range(start, self.meta["next"]))
+        return [t for t in turns if t is not None]
+
+    def load(self) -> Tuple[str, List[Turn]]:
+        return self.summary, self.turns()
+
+    def append(self, role: str, content: str):
+        self.storage.set(turn_key(self.session, self.meta["next"]), {"role": role, "content": content})
+        self.meta["next"] += 1
+        self.meta["last_active"] = time.time()
+        self.storage.set(meta_key(self.session), self.meta)
+
+    def needs_compaction(self) -> bool:
+        return self.meta["next"] - self.meta["start"] > HISTORY_WINDOW_TURNS + COMPACT_BATCH_TURNS
+
+    async def compact(self, summarize: Summarizer):
+        """Folds turns older than the window into the summary, then deletes them."""
+        if not self.needs_compaction():
+            return
+        start, end = self.meta["start"], self.meta["next"] - HISTORY_WINDOW_TURNS
+        old_turns = [t for t in (self.storage.get(turn_key(self.session, n)) for n in range(start, end)) if t]
+        self.meta["summary"] = await summarize(self.meta["summary"], old_turns)
+        self.meta["start"] = end
+        self.storage.set(meta_key(self.session), self.meta)
+        for n in range(start, end):
+            self.storage.remove(turn_key(self.session, n))
+
+    def clear(self):
+        for n in range(self.meta["start"], self.meta["next"]):
+            self.storage.remove(turn_key(self.session, n))
+        self.storage.remove(meta_key(self.session))
+
+
+def expire_idle_sessions(storage, ttl: float = SESSION_IDLE_TTL) -> int:
+    """Deletes sessions idle for longer than ttl seconds. Returns how many."""
+    sessions = storage.get(SESSIONS_KEY) or []
+    now = time.time()
+    kept, expired = [], 0
+    for session in sessions:
+        meta = storage.get(meta_key(session))
+        if meta is not None and now - meta["last_active"] < ttl:
+            kept.append(session)
+            continue
+        if meta is not None:
+            SessionMemory(storage, session).clear()
+        storage.remove(session)  # session -> sender mapping
+        expired += 1
+    if expired:
+        storage.set(SESSIONS_KEY, kept)
+    return expired
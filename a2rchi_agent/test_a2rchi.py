@@ -0,0 +1,73 @@
+import asyncio
+import math
+import random
+
+import pytest
+
+pytest.importorskip("langchain")
+
+import a2rchi
+from answer_cache import AnswerCache
+from deadline import Deadline
+
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(a2rchi, "answer_cache", cache)
+    return cache
+
+
+def test_fallback_does_not_serve_a_related_question(answer_cache):
+    answer_cache.put([1.0, 0.0], "", "What does Newton's second law say?", "F = ma.", 8.0)
+    # Cosine similarity 0.9: a related question, not the same one
+    related = [0.9, math.sqrt(1 - 0.9**2)]
+
+    deadline = Deadline(30)
+    assert a2rchi.fallback_answer("What does Newton's second law say?", related, "", deadline) == a2rchi.ANSWER_TIMEOUT
+    assert deadline.degraded == ["timeout"]
+
+
+def test_fallback_serves_the_same_question(answer_cache):
+    answer_cache.put([1.0, 0.0], "", "What does Newton's second law say?", "F = ma.", 8.0)
+
+    assert a2rchi.fallback_answer("What does Newton's second law say?", [1.0, 0.0], "", Deadline(30)) == "F = ma."
+
+
+def test_loading_a_new_index_clears_the_answer_cache(answer_cache, monkeypatch):
+    answer_cache.put([1.0, 0.0], "", "What does Newton's second law say?", "F = ma.", 8.0)
+    monkeypatch.setattr(a2rchi, "_vectorstore", object())
+    monkeypatch.setattr(a2rchi, "_vectorstore_version", 1)
+    monkeypatch.setattr(a2rchi, "index_version", lambda index_dir: 2)
+    monkeypatch.setattr(a2rchi, "load_indexes", lambda index_dir: (object(), None))
+
+    assert asyncio.run(a2rchi.refresh_vectorstore())
+    assert answer_cache.entries == []
+
+
+ANSWERS = [
+    "Use (`F = ma`). Then solve for `a`, and check units (`m/s^2`)!",
+    "Here is the code:\n\n```python\nprint(`x`)  # (`y`).\nf = m * a\n```\n\nSo (`a`) is `F/m`.",
+    "Two blocks:\n```\n(`a`).\n```\ntext (`b`), then\n```js\nconst v = `${x}`;\n```",
+    "An unclosed block (`x`).\n```python\nprint(`never closed`)",
+]
+
+
+@pytest.mark.parametrize("answer", ANSWERS)
+def test_streaming_cleaner_matches_cleaning_the_whole_answer(answer):
+    expected = a2rchi.clean_response(answer)
+    rng = random.Random(0)
+    for _ in range(200):
+        cleaner = a2rchi.StreamingCleaner()
+        out, rest = [], answer
+        while rest:
+            n = rng.randint(1, 6)
+            out.append(cleaner.feed(rest[:n]))
+            rest = rest[n:]
+        out.append(cleaner.flush())
+        assert "".join(out) == expected
+
+
+def test_code_in_fences_is_left_as_written():
+    code = "```python\nprint(`x`).\n```"
+    assert a2rchi.clean_response(f"See (`x`).\n{code}") == f"See `x`\n{code}"
@@ -0,0 +1,59 @@
+import math
+
+from answer_cache import ANSWER_CACHE_MAX_DISTANCE, AnswerCache, question_terms
+
+SECOND_LAW = "What does Newton's second law say?"
+VECTOR = [1.0, 0.0]
+
+
+def at_distance(distance: float):
+    """A unit vector at the given cosine distance from VECTOR."""
+    cos = 1.0 - distance
+    return [cos, math.sqrt(1.0 - cos**2)]
+
+
+def cache_with_second_law() -> AnswerCache:
+    cache = AnswerCache()
+    cache.put(VECTOR, "", SECOND_LAW, "F = ma.", 8.0)
+    return cache
+
+
+def test_default_distance_is_tight():
+    assert ANSWER_CACHE_MAX_DISTANCE <= 0.02
+
+
+def test_same_question_is_served():
+    cache = cache_with_second_law()
+    assert cache.get(at_distance(0.01), "", SECOND_LAW).answer == "F = ma."
+    assert cache.get(VECTOR, "", "what does newtons second law say").answer == "F = ma."
+
+
+def test_distant_question_is_not_served():
+    assert cache_with_second_law().get(at_distance(0.05), "", SECOND_LAW) is None
+
+
+def test_other_keywords_are_not_served_even_at_distance_zero():
+    cache = cache_with_second_law()
+    assert cache.get(VECTOR, "", "What does Newton's third law say?") is None
+
+
+def test_other_numbers_are_not_served_even_at_distance_zero():
+    cache = AnswerCache()
+    cache.put(VECTOR, "", "A 2 kg ball falls 10 m. How fast does it land?", "14 m/s.", 8.0)
+    assert cache.get(VECTOR, "", "A 3 kg ball falls 10 m. How fast does it land?") is None
+    assert cache.get(VECTOR, "", "A 2 kg ball falls 1.0 m. How fast does it land?") is None
+
+
+def test_other_history_is_not_served():
+    assert cache_with_second_law().get(VECTOR, "User: hi", SECOND_LAW) is None
+
+
+def test_clear_drops_every_entry():
+    cache = cache_with_second_law()
+    cache.clear()
+    assert cache.get(VECTOR, "", SECOND_LAW) is None
+
+
+def test_question_terms_ignore_case_punctuation_and_stopwords():
+    assert question_terms("What is Newton’s THIRD law?") == question_terms("newtons third law")
+    assert question_terms("A 2.5 kg cart") == (("2.5",), frozenset({"kg", "cart"}))
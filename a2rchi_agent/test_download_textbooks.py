@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from download_textbooks import STATE_FILE, DownloadState, Entry, download, download_all, read_list
+
+CHAPTER = bytes(range(256)) * 1200  # 300 KiB, several CHUNK_BYTES blocks
+ETAG = '"chapter-v1"'
+
+
+class TextbookServer(ThreadingHTTPServer):
+    """Serves CHAPTER with an ETag, honouring If-None-Match, Range and If-Range."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), TextbookHandler)
+        self.body = CHAPTER
+        self.truncate_next = None
+        self.requests = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/textbook/chapter01.pdf"
+
+
+class TextbookHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body, status = server.body, 200
+        byte_range = self.headers.get("Range")
+        if byte_range and self.headers.get("If-Range") == ETAG:
+            start = int(byte_range.split("=")[1].rstrip("-"))
+            body, status = body[start:], 206
+
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.truncate_next is not None:
+            # Drop the connection part way through, as a flaky network would
+            body, server.truncate_next = body[:server.truncate_next], None
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = TextbookServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(entry: Entry, save_dir: str, **kwargs):
+    return asyncio.run(download_all([entry], str(save_dir), **kwargs))[entry.filename]
+
+
+def test_read_list_skips_comments_and_reads_checksums(tmp_path):
+    listing = tmp_path / "textbook.list"
+    listing.write_text("# chapters\n\nhttps://example.org/a.pdf\nhttps://example.org/b.pdf ABC123\n")
+    assert read_list(str(listing)) == [
+        Entry("https://example.org/a.pdf"),
+        Entry("https://example.org/b.pdf", "abc123"),
+    ]
+
+
+def test_fresh_download(server, tmp_path):
+    entry = Entry(server.url)
+    assert fetch(entry, tmp_path) == "downloaded"
+
+    assert (tmp_path / entry.filename).read_bytes() == CHAPTER
+    assert not (tmp_path / f"{entry.filename}.part").exists()
+    record = json.loads((tmp_path / STATE_FILE).read_text())[entry.filename]
+    assert record == {"url": server.url, "sha256": hashlib.sha256(CHAPTER).hexdigest(), "etag": ETAG}
+
+
+def test_unchanged_file_is_skipped_with_304(server, tmp_path):
+    entry = Entry(server.url)
+    fetch(entry, tmp_path)
+
+    assert fetch(entry, tmp_path) == "unchanged"
+    assert server.requests[-1]["If-None-Match"] == ETAG
+    assert (tmp_path / entry.filename).read_bytes() == CHAPTER
+
+
+def test_interrupted_download_resumes_with_range(server, tmp_path):
+    entry = Entry(server.url, hashlib.sha256(CHAPTER).hexdigest())
+    state = DownloadState(str(tmp_path))
+    server.truncate_next = 200_000
+
+    async def interrupted_then_resumed():
+        async with httpx.AsyncClient() as client:
+            with pytest.raises((httpx.TransportError, IOError)):
+                await download(client, entry, str(tmp_path), state)
+            offset = os.path.getsize(tmp_path / f"{entry.filename}.part")
+            return offset, await download(client, entry, str(tmp_path), state)
+
+    offset, status = asyncio.run(interrupted_then_resumed())
+    assert 0 < offset < len(CHAPTER)
+    assert status == "resumed"
+    assert server.requests[-1]["Range"] == f"bytes={offset}-"
+    assert (tmp_path / entry.filename).read_bytes() == CHAPTER
+    assert not (tmp_path / f"{entry.filename}.part").exists()
+
+
+def test_corrupt_local_file_is_fetched_again(server, tmp_path):
+    entry = Entry(server.url)
+    fetch(entry, tmp_path)
+    (tmp_path / entry.filename).write_bytes(b"%PDF truncated")
+
+    assert fetch(entry, tmp_path) == "downloaded"
+    assert "If-None-Match" not in server.requests[-1]
+    assert (tmp_path / entry.filename).read_bytes() == CHAPTER
+
+
+def test_checksum_mismatch_fails_without_leaving_a_file(server, tmp_path):
+    entry = Entry(server.url, hashlib.sha256(b"a different chapter").hexdigest())
+
+    assert fetch(entry, tmp_path) == "failed"
+    assert not (tmp_path / entry.filename).exists()
+    assert not (tmp_path / f"{entry.filename}.part").exists()
+    assert "partial" not in json.loads((tmp_path / STATE_FILE).read_text()).get(entry.filename, {})
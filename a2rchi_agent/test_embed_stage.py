@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.embed_stage import AdaptiveLimiter, EmbeddingStage
+
+LATENCY = 0.05
+
+
+def fake_embedding(text: str):
+    return [float(len(text)), float(sum(map(ord, text)) % 997)]
+
+
+class EmbeddingServer(ThreadingHTTPServer):
+    """
+    Fake /v1/embeddings. The first rate_limited requests get a 429, and
+    requests after fail_after successes get a 400. Data comes back in
+    reverse order, so callers have to sort by index.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), EmbeddingHandler)
+        self.lock = threading.Lock()
+        self.rate_limited = 0
+        self.fail_after = None
+        self.served = 0
+        self.throttled = 0
+        self.inputs = []
+        self.in_flight = 0
+        self.peak = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        time.sleep(LATENCY)
+        with server.lock:
+            server.in_flight -= 1
+            if server.throttled < server.rate_limited:
+                server.throttled += 1
+                status = 429
+            elif server.fail_after is not None and server.served >= server.fail_after:
+                status = 400
+            else:
+                server.served += 1
+                server.inputs.append(body["input"])
+                status = 200
+
+        if status == 200:
+            data = [{"object": "embedding", "index": i, "embedding": fake_embedding(t)} for i, t in enumerate(body["input"])]
+            payload = {"object": "list", "model": body["model"], "data": data[::-1], "usage": {"prompt_tokens": 1, "total_tokens": 1}}
+            headers = {}
+        else:
+            payload = {"error": {"message": "rate limited" if status == 429 else "bad request", "type": "test"}}
+            headers = {"Retry-After": "0"} if status == 429 else {}
+        out = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in {"Content-Type": "application/json", "Content-Length": str(len(out)), **headers}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    server = EmbeddingServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+TEXTS = [f"chunk {i} " * (i + 1) for i in range(10)]
+
+
+def test_vectors_come_back_in_order_within_the_in_flight_cap(server):
+    stage = EmbeddingStage(batch_size=3, max_in_flight=2, base_url=server.url)
+
+    assert stage.embed_sync(TEXTS) == [fake_embedding(t) for t in TEXTS]
+    assert sorted(len(batch) for batch in server.inputs) == [1, 3, 3, 3]
+    assert server.peak == 2
+
+
+def test_rate_limits_are_retried(server):
+    server.rate_limited = 3
+    stage = EmbeddingStage(batch_size=3, max_in_flight=4, base_url=server.url)
+
+    assert stage.embed_sync(TEXTS) == [fake_embedding(t) for t in TEXTS]
+    assert server.throttled == 3
+    assert sum(len(batch) for batch in server.inputs) == len(TEXTS)
+
+
+def test_an_interrupted_run_resumes_from_the_checkpoint(server, tmp_path):
+    checkpoint = str(tmp_path / "embeddings.checkpoint.jsonl")
+    server.fail_after = 2
+    with pytest.raises(openai.BadRequestError):
+        EmbeddingStage(batch_size=3, max_in_flight=1, checkpoint_path=checkpoint, base_url=server.url).embed_sync(TEXTS)
+    assert server.inputs == [TEXTS[0:3], TEXTS[3:6]]
+
+    server.fail_after, server.inputs = None, []
+    stage = EmbeddingStage(batch_size=3, max_in_flight=1, checkpoint_path=checkpoint, base_url=server.url)
+    assert len(stage.done) == 6
+    assert stage.embed_sync(TEXTS) == [fake_embedding(t) for t in TEXTS]
+    assert server.inputs == [TEXTS[6:9], TEXTS[9:]]
+
+
+def test_groups_share_batches_and_repeated_texts_are_embedded_once(server):
+    stage = EmbeddingStage(batch_size=4, max_in_flight=2, base_url=server.url)
+    groups = [("a.pdf", TEXTS[:3]), ("b.pdf", TEXTS[2:5]), ("c.pdf", [])]
+
+    async def collect():
+        return {group: vectors async for group, vectors in stage.embed_stream(groups)}
+
+    results = asyncio.run(collect())
+    assert results == {source: [fake_embedding(t) for t in texts] for source, texts in groups}
+    assert sorted(t for batch in server.inputs for t in batch) == sorted(TEXTS[:5])
+
+
+def test_limiter_halves_on_rate_limit_and_grows_back():
+    async def scenario():
+        limiter = AdaptiveLimiter(4)
+        await limiter.acquire()
+        await limiter.release(rate_limited=True)
+        after_limit = limiter.limit
+        for _ in range(2):
+            await limiter.acquire()
+            await limiter.release()
+        return after_limit, limiter.limit
+
+    assert asyncio.run(scenario()) == (2, 3)
@@ -0,0 +1,9 @@
+"""
+Code shared by the agents: client pooling, caches, the vector index format,
+index-building stages, warmup and session stores.
+
+Agents run from their own directories, so each one has a repo_path module
+that puts the repo root on sys.path; import it before agent_common.
+Importing this package loads nothing else, so agents only pay for the
+modules they use.
+"""
@@ -0,0 +1,161 @@
+"""
+Process-wide registry of HTTP and LLM clients.
+
+Creating ChatOpenAI, OpenAIEmbeddings or OpenAI per request opens a new
+connection pool each time, so every call pays for TCP and TLS setup. Here
+each upstream gets one pooled httpx transport (async and sync), and every
+client built through get_* shares it. Pool sizes and timeouts come from
+the HTTP_* environment variables below. pool_stats() reports requests,
+connections opened (each one a TLS handshake) and open/idle connections.
+
+The async clients belong to the event loop that first uses them, i.e.
+the agent's loop. Scripts that call asyncio.run() repeatedly should build
+their own clients.
+"""
+
+import os
+import threading
+import weakref
+from typing import Any, Dict, Tuple
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+
+_lock = threading.Lock()
+_transports: Dict[Tuple[str, bool], Any] = {}
+_http_clients: Dict[Tuple[str, bool], Any] = {}
+_clients: Dict[Tuple, Any] = {}
+
+
+class _PoolStats:
+    def __init__(self):
+        self.requests = 0
+        self.seen = weakref.WeakSet()
+        self.opened = 0
+
+    def observe(self, pool):
+        self.requests += 1
+        for conn in getattr(pool, "connections", []):
+            if conn not in self.seen:
+                self.seen.add(conn)
+                self.opened += 1
+
+    def snapshot(self, pool) -> Dict[str, int]:
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "requests": self.requests,
+            "connections_opened": self.opened,
+            "open": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+        }
+
+
+class CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = _PoolStats()
+
+    async def handle_async_request(self, request):
+        response = await super().handle_async_request(request)
+        self.stats.observe(self._pool)
+        return response
+
+
+class CountingTransport(httpx.HTTPTransport):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = _PoolStats()
+
+    def handle_request(self, request):
+        response = super().handle_request(request)
+        self.stats.observe(self._pool)
+        return response
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def get_http_client(upstream: str = "openai", sync: bool = False):
+    """Returns the shared httpx client for an upstream, creating it on first use."""
+    key = (upstream, sync)
+    with _lock:
+        if key not in _http_clients:
+            transport_cls, client_cls = (CountingTransport, httpx.Client) if sync else (CountingAsyncTransport, httpx.AsyncClient)
+            transport = transport_cls(limits=_limits())
+            _transports[key] = transport
+            _http_clients[key] = client_cls(transport=transport, timeout=_timeout())
+        return _http_clients[key]
+
+
+def _cached(key: Tuple, factory):
+    with _lock:
+        client = _clients.get(key)
+    if client is None:
+        client = factory()
+        with _lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def get_chat_model(model: str = "gpt-4o", temperature: float = 0, **kwargs):
+    """Returns a shared ChatOpenAI on the pooled OpenAI transports."""
+    from langchain_openai import ChatOpenAI
+
+    key = ("chat", model, temperature, tuple(sorted(kwargs.items())))
+    return _cached(key, lambda: ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=get_http_client("openai", sync=True),
+        http_async_client=get_http_client("openai"),
+        **kwargs,
+    ))
+
+
+def get_embeddings(**kwargs):
+    """Returns a shared OpenAIEmbeddings on the pooled OpenAI transports."""
+    from langchain_openai import OpenAIEmbeddings
+
+    key = ("embeddings", tuple(sorted(kwargs.items())))
+    return _cached(key, lambda: OpenAIEmbeddings(
+        http_client=get_http_client("openai", sync=True),
+        http_async_client=get_http_client("openai"),
+        **kwargs,
+    ))
+
+
+def get_openai():
+    """Returns a shared synchronous OpenAI SDK client."""
+    from openai import OpenAI
+
+    return _cached(("openai",), lambda: OpenAI(http_client=get_http_client("openai", sync=True)))
+
+
+def get_async_openai():
+    """Returns a shared AsyncOpenAI SDK client."""
+    from openai import AsyncOpenAI
+
+    return _cached(("async_openai",), lambda: AsyncOpenAI(http_client=get_http_client("openai")))
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Per-transport counters, keyed like 'openai' or 'openai:sync'."""
+    with _lock:
+        transports = dict(_transports)
+    return {
+        f"{upstream}{':sync' if sync else ''}": t.stats.snapshot(t._pool)
+        for (upstream, sync), t in transports.items()
+    }
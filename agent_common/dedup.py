@@ -0,0 +1,156 @@
+"""
+Near-duplicate chunk filter for index builders (MinHash + LSH).
+
+Repeated boilerplate such as page headers, exercise preambles and API
+tables costs embedding calls and crowds retrieval results, even when two
+copies differ by a word or two. Each chunk gets a MinHash signature over
+its word shingles. LSH banding finds earlier chunks that might be similar,
+and a chunk is dropped when its estimated Jaccard similarity to one of
+them is at least threshold. The first copy seen is kept.
+
+Builders label each chunk with its source file. A file whose dropped
+chunks were copies of chunks in another file depends on that file: when it
+changes or goes away, the dependent file must be filtered again or its
+content would be lost from the index (see dependent_sources).
+
+Hashes are crc32 and the permutations are seeded, so the same input and
+order always keep the same chunks.
+"""
+
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+DEDUP_THRESHOLD = 0.9
+DEDUP_REPORT_THRESHOLDS = (0.7, 0.8, 0.9, 0.95)
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_word = re.compile(r"\w+")
+
+
+def lsh_params(threshold: float, num_perm: int):
+    """
+    (bands, rows per band) whose candidate threshold (1/bands)^(1/rows) is
+    as high as possible without exceeding threshold, so true near-duplicates
+    almost always become candidates.
+    """
+    best = (num_perm, 1)
+    best_t = 0.0
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        t = (1 / bands) ** (1 / rows)
+        if best_t < t <= threshold:
+            best, best_t = (bands, rows), t
+    return best
+
+
+class NearDuplicateFilter:
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        shingle_words: int = SHINGLE_WORDS,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.seed = seed
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE), num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._kept: List[np.ndarray] = []
+        self._labels: List[Any] = []
+        self.seen: List[np.ndarray] = []
+        self.removed = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _word.findall(text.lower())
+        n = self.shingle_words
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # hash < 2^32 and a < 2^31, so the products fit in 64 bits
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE).min(axis=0)
+
+    def add(self, text: str, label: Any = None) -> bool:
+        """Remembers text under label and returns True, or returns False if it near-duplicates an earlier one."""
+        return self.add_signature(self.signature(text), label)
+
+    def add_signature(self, signature: np.ndarray, label: Any = None) -> bool:
+        return self._add(signature, label)[0]
+
+    def _add(self, signature: np.ndarray, label: Any) -> Tuple[bool, Any]:
+        """(True, None) if kept, else (False, label of the earlier copy)."""
+        self.seen.append(signature)
+        keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        for c in candidates:
+            if np.mean(self._kept[c] == signature) >= self.threshold:
+                self.removed += 1
+                return False, self._labels[c]
+
+        position = len(self._kept)
+        self._kept.append(signature)
+        self._labels.append(label)
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(position)
+        return True, None
+
+    def filter(self, texts: Iterable[str]) -> List[int]:
+        """Positions of the texts that are kept."""
+        return self.filter_labeled(texts)[0]
+
+    def filter_labeled(self, texts: Iterable[str], label: Any = None) -> Tuple[List[int], Set[Any]]:
+        """
+        Positions of the texts that are kept (remembered under label), and
+        the labels of the earlier copies that the dropped texts repeat.
+        """
+        kept, copies_of = [], set()
+        for i, text in enumerate(texts):
+            added, copy_of = self._add(self.signature(text), label)
+            if added:
+                kept.append(i)
+            else:
+                copies_of.add(copy_of)
+        return kept, copies_of
+
+    def report(self, thresholds: Sequence[float] = DEDUP_REPORT_THRESHOLDS) -> Dict[float, int]:
+        """How many of the chunks seen so far each threshold would remove."""
+        removed = {}
+        for threshold in thresholds:
+            trial = NearDuplicateFilter(threshold, self.num_perm, self.shingle_words, self.seed)
+            for signature in self.seen:
+                trial.add_signature(signature)
+            removed[threshold] = trial.removed
+        return removed
+
+
+def dependent_sources(indexed: Dict[str, dict], gone: Iterable[str]) -> Set[str]:
+    """
+    Sources in a builder manifest ({source: {"copies_of": [...], ...}})
+    that dropped chunks as copies of chunks in a gone (changed or removed)
+    source, directly or through another dependent. They have to be filtered
+    again, since the copy they relied on may not be in the next index.
+    """
+    gone = set(gone)
+    dependents = set()
+    while True:
+        found = {s for s, info in indexed.items() if s not in gone and gone.intersection(info.get("copies_of", ()))}
+        if not found:
+            return dependents
+        dependents |= found
+        gone |= found
+
+
+def print_report(dedup: NearDuplicateFilter, thresholds: Sequence[float] = DEDUP_REPORT_THRESHOLDS):
+    counts = ", ".join(f"{t:g}: {n}" for t, n in dedup.report(thresholds).items())
+    print(f"🧬 Near-duplicates removed at threshold {dedup.threshold:g}: {dedup.removed}/{len(dedup.seen)} chunks")
+    print(f"   other thresholds would remove {counts}")
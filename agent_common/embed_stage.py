@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from openai import AsyncOpenAI, RateLimitError
+
+# Must match the model the agents embed queries with (OpenAIEmbeddings' default)
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+G = TypeVar("G")
+
+
+class AdaptiveLimiter:
+    """
+    Caps in-flight requests. The cap halves on every rate limit and grows
+    back by one after a run of successes, up to max_in_flight.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight
+        self.active = 0
+        self.successes = 0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self, rate_limited: bool = False):
+        async with self.cond:
+            self.active -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.limit < self.max_in_flight and self.successes >= self.limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.cond.notify_all()
+
+
+class EmbeddingStage:
+    """
+    Embeds texts in batches with a bounded number of concurrent requests.
+
+    Completed batches are appended to a checkpoint file, keyed by text hash,
+    so an interrupted build picks up where it left off. The client honours
+    OPENAI_BASE_URL, or pass base_url, to run against a local fake server.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        batch_size: int = 256,
+        max_in_flight: int = 4,
+        checkpoint_path: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_retries: int = 8,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.checkpoint_path = checkpoint_path
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.done: Dict[str, List[float]] = self._load_checkpoint()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _load_checkpoint(self) -> Dict[str, List[float]]:
+        done = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final write from an interrupted run
+                if record.get("model") == self.model:
+                    done[record["key"]] = record["embedding"]
+        if done:
+            print(f"♻️ Resuming with {len(done)} checkpointed embeddings")
+        return done
+
+    def _save_batch(self, keys: List[str], vectors: List[List[float]]):
+        if not self.checkpoint_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            for k, v in zip(keys, vectors):
+                f.write(json.dumps({"model": self.model, "key": k, "embedding": v}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    async def _embed_batch(self, client: AsyncOpenAI, limiter: AdaptiveLimiter, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                response = await client.embeddings.create(model=self.model, input=texts)
+            except RateLimitError as e:
+                await limiter.release(rate_limited=True)
+                if attempt == self.max_retries:
+                    raise
+                retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                print(f"⏳ Rate limited, retrying batch in {delay:.1f}s (in-flight cap {limiter.limit})")
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                await limiter.release()
+                raise
+            await limiter.release()
+            return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Returns one embedding per text, in order."""
+        async for _, vectors in self.embed_stream([(None, texts)]):
+            result = vectors
+        return result
+
+    async def embed_stream(self, groups: Iterable[Tuple[G, List[str]]]) -> AsyncIterator[Tuple[G, List[List[float]]]]:
+        """
+        Embeds groups of texts, such as one file's chunks each, in a single
+        run: one client and one rate limiter for all of them, with batches
+        filled across groups. groups may block (it's read in a worker
+        thread), so producing the next group overlaps embedding earlier
+        ones. Yields (group, vectors) in completion order, once every text
+        of the group is embedded and checkpointed.
+        """
+        limiter = AdaptiveLimiter(self.max_in_flight)
+        results: asyncio.Queue = asyncio.Queue()
+        pending: Dict[str, str] = {}  # key -> text, not sent yet
+        waiting: Dict[str, List[list]] = {}  # key -> [group, keys, texts left] entries
+        tasks = set()
+        progress = {"queued": 0, "done": 0}
+        start = time.perf_counter()
+
+        def finish(entry: list):
+            group, keys, _ = entry
+            results.put_nowait((group, [self.done[k] for k in keys]))
+
+        async def run(client: AsyncOpenAI, batch):
+            try:
+                vectors = await self._embed_batch(client, limiter, [t for _, t in batch])
+            except Exception as e:
+                results.put_nowait(e)
+                return
+            batch_keys = [k for k, _ in batch]
+            self._save_batch(batch_keys, vectors)
+            self.done.update(zip(batch_keys, vectors))
+            progress["done"] += len(batch)
+            print(f"🧮 Embedded {progress['done']}/{progress['queued']} chunks ({time.perf_counter() - start:.1f}s)")
+            for k in batch_keys:
+                for entry in waiting.pop(k):
+                    entry[2] -= 1
+                    if not entry[2]:
+                        finish(entry)
+
+        def launch(client: AsyncOpenAI, final: bool = False):
+            while len(pending) >= self.batch_size or (final and pending):
+                batch = list(pending.items())[:self.batch_size]
+                for k, _ in batch:
+                    del pending[k]
+                task = asyncio.create_task(run(client, batch))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        async def produce(client: AsyncOpenAI):
+            try:
+                items = iter(groups)
+                while True:
+                    item = await asyncio.to_thread(next, items, None)
+                    if item is None:
+                        break
+                    group, texts = item
+                    keys = [self.key(t) for t in texts]
+                    entry = [group, keys, 0]
+                    for k, t in dict(zip(keys, texts)).items():
+                        if k in self.done:
+                            continue
+                        if k not in waiting:
+                            waiting[k] = []
+                            pending[k] = t
+                            progress["queued"] += 1
+                        waiting[k].append(entry)
+                        entry[2] += 1
+                    if not entry[2]:
+                        finish(entry)
+                    launch(client)
+                launch(client, final=True)
+                if tasks:
+                    await asyncio.wait(set(tasks))
+                results.put_nowait(None)
+            except Exception as e:
+                results.put_nowait(e)
+
+        async with AsyncOpenAI(base_url=self.base_url, max_retries=0) as client:
+            producer = asyncio.create_task(produce(client))
+            try:
+                while True:
+                    result = await results.get()
+                    if result is None:
+                        break
+                    if isinstance(result, Exception):
+                        raise result
+                    yield result
+            finally:
+                for task in [producer, *tasks]:
+                    task.cancel()
+
+    def embed_sync(self, texts: List[str]) -> List[List[float]]:
+        return asyncio.run(self.embed(texts))
@@ -0,0 +1,94 @@
+"""
+Helpers shared by the index builders (a2rchi_agent/build_index.py and
+animejs_agent/make_index.py).
+
+A built index directory holds a manifest.json next to the vector files. It
+records the settings the chunks were made with and, per source, its hash
+and chunk ids, so a rebuild only re-parses what changed. New indexes are
+written to a staging directory and swapped in with renames.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_hash(fpath: Path) -> str:
+    h = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def ingest_files(
+    ingest: Callable[..., tuple], jobs: Dict[str, tuple], workers: Optional[int], failed: tuple = ()
+) -> Iterator[tuple]:
+    """
+    Runs ingest(source, *args) for each {source: args} in a process pool and
+    yields its results as they finish. A source that raises yields
+    (source, None, 0.0, *failed) instead.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest, source, *args): source for source, args in jobs.items()}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                print(f"❌ Error ingesting {source}: {e}")
+                yield (source, None, 0.0, *failed)
+
+def print_timings(timings: Dict[str, float]):
+    print("⏱️ Stage timings:")
+    for stage, seconds in timings.items():
+        print(f"   {stage:<12} {seconds:8.2f}s")
+
+def load_manifest(output_dir: str, key: str, settings: dict, message: str) -> Optional[dict]:
+    """The index's manifest, or None if there is none or manifest[key] isn't settings (printing message)."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get(key) != settings:
+        print(message)
+        return None
+    return manifest
+
+def write_manifest(index_dir: str, manifest: dict):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+def prepare_staging(output_dir: str) -> str:
+    staging_dir = f"{output_dir}.new"
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    return staging_dir
+
+def publish_index(staging_dir: str, output_dir: str, manifest: dict):
+    """
+    Writes the manifest into the staged index and swaps it in with renames,
+    so a running agent never sees a half-written index.
+    """
+    retired_dir = f"{output_dir}.old"
+    if os.path.exists(retired_dir):
+        shutil.rmtree(retired_dir)
+
+    write_manifest(staging_dir, manifest)
+    if os.path.exists(output_dir):
+        os.rename(output_dir, retired_dir)
+    os.rename(staging_dir, output_dir)
+    if os.path.exists(retired_dir):
+        shutil.rmtree(retired_dir)
+        print(f"🧹 Replaced old index at {output_dir}")
@@ -0,0 +1,138 @@
+"""
+Two-tier cache for query embeddings: an in-memory LRU in front of a SQLite
+file. Keys are the normalized query text plus the embedding model, so the
+same file can be shared by every agent on the host (a2rchi and animejs
+both default to it).
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "QUERY_EMBEDDING_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "fetch_projects", "query_embeddings.sqlite3"),
+)
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, capacity: int = 4096):
+        self.capacity = capacity
+        self.memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, model TEXT, vector BLOB, created REAL)"
+            )
+
+    @staticmethod
+    def key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model: str, count: bool = True) -> Optional[List[float]]:
+        """The cached vector for text, or None. count=False leaves the hit-rate counters alone."""
+        key = self.key(text, model)
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                if count:
+                    self.counters["memory_hits"] += 1
+                return vector
+
+            row = None
+            if self.db is not None:
+                row = self.db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                if count:
+                    self.counters["misses"] += 1
+                return None
+
+            vector = array("f", row[0]).tolist()
+            self._remember(key, vector)
+            if count:
+                self.counters["disk_hits"] += 1
+            return vector
+
+    def put(self, text: str, model: str, vector: List[float]):
+        key = self.key(text, model)
+        with self.lock:
+            self._remember(key, vector)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (key, model, array("f", vector).tobytes(), time.time()),
+                )
+
+    def _remember(self, key: str, vector: List[float]):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = sum(stats.values())
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+class CachedEmbeddings:
+    """
+    Wraps a LangChain embeddings object so repeated queries skip the
+    embedding call. Document embedding is passed straight through.
+    """
+
+    def __init__(self, embeddings, cache: Optional[QueryEmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.cache = cache or QueryEmbeddingCache()
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text, self.model)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(text, self.model, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text, self.model)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put(text, self.model, vector)
+        return vector
+
+    def cached_query(self, text: str) -> Optional[List[float]]:
+        """
+        The cached vector for text, or None. Never calls the embedding API and
+        is not counted in stats(), so lexical fast-path probes don't read as misses.
+        """
+        return self.cache.get(text, self.model, count=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
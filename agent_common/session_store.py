@@ -0,0 +1,178 @@
+"""
+Session storage backends for chat protocols.
+
+The agent's default ctx.storage rewrites its whole JSON file on every set,
+so per-message writes get slower as sessions pile up. These stores offer
+the same get/has/set/remove/clear interface with O(1) writes:
+
+    SQLiteSessionStore  one row per key in a WAL-mode SQLite file
+    LogSessionStore     append-only JSON log, compacted when mostly dead
+
+Every key expires ttl seconds after it was last written, and expire()
+reclaims the space. open_session_store() picks a backend from a spec such
+as "sqlite:sessions.sqlite3", "log:sessions.log" or "agent" (use
+ctx.storage as before).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite:sessions.sqlite3")
+SESSION_STORE_TTL = float(os.getenv("SESSION_STORE_TTL", str(7 * 24 * 3600)))
+
+
+class SQLiteSessionStore:
+    handles_expiry = True
+
+    def __init__(self, path: str, ttl: float = SESSION_STORE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # auto_vacuum only takes effect on a new database
+        self.db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires)")
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            row = self.db.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl),
+            )
+
+    def remove(self, key: str):
+        with self.lock:
+            self.db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM kv")
+
+    def expire(self) -> int:
+        """Deletes expired keys and returns their pages to the OS."""
+        with self.lock:
+            removed = self.db.execute("DELETE FROM kv WHERE expires < ?", (time.time(),)).rowcount
+            self.db.execute("PRAGMA incremental_vacuum")
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+
+class LogSessionStore:
+    """
+    Every write appends one line to the log and updates an in-memory map.
+    When dead lines outnumber live ones (and the log is over min_compact_bytes)
+    the live entries are rewritten to a fresh log that replaces the old one.
+    """
+
+    handles_expiry = True
+
+    def __init__(self, path: str, ttl: float = SESSION_STORE_TTL, min_compact_bytes: int = 1 << 20):
+        self.path = path
+        self.ttl = ttl
+        self.min_compact_bytes = min_compact_bytes
+        self.lock = threading.Lock()
+        self.data: Dict[str, Tuple[Any, float]] = {}
+        self.lines = 0
+        self._replay()
+        self.log = open(path, "a", encoding="utf-8")
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                self.lines += 1
+                if "v" in op:
+                    self.data[op["k"]] = (op["v"], op["e"])
+                else:
+                    self.data.pop(op["k"], None)
+
+    def _append(self, op: Dict[str, Any]):
+        self.log.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self.log.flush()
+        self.lines += 1
+
+    def get(self, key: str) -> Any:
+        entry = self.data.get(key)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def set(self, key: str, value: Any):
+        expires = time.time() + self.ttl
+        with self.lock:
+            self._append({"k": key, "v": value, "e": expires})
+            self.data[key] = (value, expires)
+            self._maybe_compact()
+
+    def remove(self, key: str):
+        with self.lock:
+            if self.data.pop(key, None) is not None:
+                self._append({"k": key})
+                self._maybe_compact()
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self._compact()
+
+    def expire(self) -> int:
+        now = time.time()
+        with self.lock:
+            expired = [k for k, (_, e) in self.data.items() if e < now]
+            for k in expired:
+                del self.data[k]
+            if expired:
+                self._compact()
+        return len(expired)
+
+    def _maybe_compact(self):
+        if self.lines > 2 * len(self.data) and self.log.tell() > self.min_compact_bytes:
+            self._compact()
+
+    def _compact(self):
+        tmp = f"{self.path}.compact"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for k, (v, e) in self.data.items():
+                f.write(json.dumps({"k": k, "v": v, "e": e}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.log.close()
+        os.replace(tmp, self.path)
+        self.log = open(self.path, "a", encoding="utf-8")
+        self.lines = len(self.data)
+
+
+def open_session_store(spec: str = SESSION_STORE, ttl: float = SESSION_STORE_TTL):
+    """Returns a store for spec, or None for "agent" (use ctx.storage)."""
+    kind, _, path = spec.partition(":")
+    if kind == "agent":
+        return None
+    if kind == "sqlite":
+        return SQLiteSessionStore(path or "sessions.sqlite3", ttl)
+    if kind == "log":
+        return LogSessionStore(path or "sessions.log", ttl)
+    raise ValueError(f"Unknown session store {spec!r}, expected sqlite:<path>, log:<path> or agent")
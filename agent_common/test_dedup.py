@@ -0,0 +1,26 @@
+from agent_common.dedup import NearDuplicateFilter, dependent_sources
+
+BOILERPLATE = "Exercise preamble: show all work, state your assumptions and give units for every answer you compute."
+FORCES = "Newton's third law says the forces two bodies exert on each other are equal in size and opposite in direction."
+
+
+def test_filter_labeled_reports_which_source_kept_the_copy():
+    dedup = NearDuplicateFilter(0.9)
+    assert dedup.filter_labeled([BOILERPLATE, FORCES], "a.pdf") == ([0, 1], set())
+
+    kept, copies_of = dedup.filter_labeled(["A different chunk about projectiles and parabolas in flight.", BOILERPLATE], "b.pdf")
+    assert kept == [0]
+    assert copies_of == {"a.pdf"}
+
+
+def test_dependent_sources_follows_chains_of_copies():
+    indexed = {
+        "a.pdf": {},
+        "b.pdf": {"copies_of": ["a.pdf"]},
+        "c.pdf": {"copies_of": ["b.pdf"]},
+        "d.pdf": {"copies_of": ["e.pdf"]},
+        "e.pdf": {},
+    }
+    assert dependent_sources(indexed, ["a.pdf"]) == {"b.pdf", "c.pdf"}
+    assert dependent_sources(indexed, ["b.pdf"]) == {"c.pdf"}
+    assert dependent_sources(indexed, ["c.pdf", "d.pdf"]) == set()
@@ -0,0 +1,39 @@
+import os
+
+from agent_common.index_build import MANIFEST_FILE, ingest_files, load_manifest, prepare_staging, publish_index
+
+SETTINGS = {"chunk_size": 500, "chunk_overlap": 50}
+
+
+def split_words(source: str, text: str):
+    if not text:
+        raise ValueError("empty")
+    return source, text.split(), 0.0
+
+
+def test_publish_replaces_the_index_and_keeps_the_manifest(tmp_path):
+    output_dir = str(tmp_path / "index")
+    for version in (1, 2):
+        staging_dir = prepare_staging(output_dir)
+        os.makedirs(staging_dir)
+        publish_index(staging_dir, output_dir, {"splitter": SETTINGS, "files": {}, "version": version})
+
+    assert sorted(os.listdir(tmp_path)) == ["index"]
+    assert os.listdir(output_dir) == [MANIFEST_FILE]
+    assert load_manifest(output_dir, "splitter", SETTINGS, "changed")["version"] == 2
+
+
+def test_manifest_with_other_settings_is_ignored(tmp_path, capsys):
+    output_dir = str(tmp_path / "index")
+    assert load_manifest(output_dir, "splitter", SETTINGS, "changed") is None
+
+    staging_dir = prepare_staging(output_dir)
+    os.makedirs(staging_dir)
+    publish_index(staging_dir, output_dir, {"splitter": SETTINGS, "files": {}})
+    assert load_manifest(output_dir, "splitter", {**SETTINGS, "chunk_size": 900}, "♻️ settings changed") is None
+    assert "♻️ settings changed" in capsys.readouterr().out
+
+
+def test_ingest_files_yields_every_source_and_marks_failures():
+    results = ingest_files(split_words, {"a": ("one two",), "b": ("",)}, workers=2, failed=(False,))
+    assert sorted(results, key=lambda r: r[0]) == [("a", ["one", "two"], 0.0), ("b", None, 0.0, False)]
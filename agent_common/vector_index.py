@@ -0,0 +1,242 @@
+"""
+On-disk vector index that loads without unpickling anything.
+
+An index directory holds:
+    meta.json         count, dimension and embedding model
+    vectors.f32       float32 matrix, one row per chunk, memory-mapped
+    norms.f32         squared row norms, for L2 distance
+    docstore.jsonl    one {"id", "text", "metadata"} record per row
+    docstore.offsets  uint64 byte offsets of each record (count + 1 entries)
+
+Opening an index maps the files read-only, so startup does no parsing and
+every agent process on the host shares the same page cache. Chunk text is
+read from the docstore only for the rows a search returns. Call close()
+before replacing an index directory: Windows won't rename or delete files
+that are still mapped.
+
+Search is exact by default. build_ann() can add an approximate index
+(ann.faiss, HNSW or IVF-PQ via faiss) for corpora too large to scan.
+"""
+
+import json
+import mmap
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+ANN_FILE = "ann.faiss"
+ANN_BACKENDS = ("flat", "hnsw", "ivfpq")
+
+
+class IndexWriter:
+    """Streams rows into a new index directory. Call close() to finish it."""
+
+    def __init__(self, index_dir: str, model: str):
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.model = model
+        self.dim: Optional[int] = None
+        self.count = 0
+        self._vectors = open(os.path.join(index_dir, "vectors.f32"), "wb")
+        self._norms = open(os.path.join(index_dir, "norms.f32"), "wb")
+        self._docs = open(os.path.join(index_dir, "docstore.jsonl"), "wb")
+        self._offsets = [0]
+
+    def add(self, vectors, records: List[Dict[str, Any]]):
+        """Appends rows. Each record is {"id", "text", "metadata"}."""
+        if not records:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(records), -1)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {matrix.shape[1]}")
+
+        self._vectors.write(matrix.tobytes())
+        self._norms.write(np.einsum("ij,ij->i", matrix, matrix).astype(np.float32).tobytes())
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+            self._docs.write(line)
+            self._offsets.append(self._offsets[-1] + len(line))
+        self.count += len(records)
+
+    def close(self):
+        for f in (self._vectors, self._norms, self._docs):
+            f.close()
+        np.asarray(self._offsets, dtype=np.uint64).tofile(os.path.join(self.index_dir, "docstore.offsets"))
+        meta = {"format": FORMAT_VERSION, "count": self.count, "dim": self.dim or 0, "model": self.model, "metric": "l2"}
+        with open(os.path.join(self.index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+
+class MmapIndex:
+    """Read-only, memory-mapped view of an index directory. Exact L2 search."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        try:
+            with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No vector index in {index_dir}; build it with the agent's index builder") from None
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {index_dir}: {self.meta.get('format')}")
+
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+        if self.count:
+            self.vectors = np.memmap(os.path.join(index_dir, "vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            self.norms = np.memmap(os.path.join(index_dir, "norms.f32"), dtype=np.float32, mode="r", shape=(self.count,))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self.norms = np.zeros((0,), dtype=np.float32)
+        self.offsets = np.fromfile(os.path.join(index_dir, "docstore.offsets"), dtype=np.uint64)
+        self._docs = b""
+        with open(os.path.join(index_dir, "docstore.jsonl"), "rb") as f:
+            # An empty file can't be mapped
+            if self.count:
+                self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.ann = load_ann(index_dir, self.meta.get("ann"))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        """Releases the memory maps. Arrays sliced from vectors before this keep theirs."""
+        if isinstance(self._docs, mmap.mmap):
+            self._docs.close()
+        self._docs = b""
+        self.vectors = self.norms = None
+        self.ann = None
+
+    def record(self, i: int) -> Dict[str, Any]:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._docs[start:end])
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self.count):
+            yield self.record(i)
+
+    def document(self, i: int) -> Document:
+        record = self.record(i)
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def search(self, query_vector, k: int) -> List[Tuple[int, float]]:
+        """Returns up to k (row, squared L2 distance) pairs, nearest first."""
+        if not self.count:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        if self.ann is not None:
+            distances, rows = self.ann.search(q.reshape(1, -1), min(k, self.count))
+            return [(int(i), float(d)) for i, d in zip(rows[0], distances[0]) if i >= 0]
+
+        distances = self.norms - 2.0 * (self.vectors @ q) + float(q @ q)
+        k = min(k, self.count)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(int(i), float(distances[i])) for i in top]
+
+    def similarity_search_by_vector(self, query_vector, k: int = 4) -> List[Document]:
+        return [self.document(i) for i, _ in self.search(query_vector, k)]
+
+
+def index_version(index_dir: str) -> Optional[int]:
+    """Returns the mtime of the index's meta file, or None if there is no index on disk."""
+    try:
+        return os.stat(os.path.join(index_dir, META_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def build_ann(index_dir: str, backend: str, **params):
+    """
+    Trains an approximate index over a finished index directory's vectors
+    and records it in meta.json. backend "flat" removes any existing one.
+
+    hnsw params:  m (graph degree, 32), ef_construction (200), ef_search (64)
+    ivfpq params: nlist (4 * sqrt(n)), pq_m (sub-quantizers, 64), nbits (8), nprobe (16)
+    """
+    if backend not in ANN_BACKENDS:
+        raise ValueError(f"Unknown ANN backend {backend!r}, expected one of {ANN_BACKENDS}")
+
+    meta_path = os.path.join(index_dir, META_FILE)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    ann_path = os.path.join(index_dir, ANN_FILE)
+    if os.path.exists(ann_path):
+        os.remove(ann_path)
+    meta.pop("ann", None)
+
+    if backend != "flat" and meta["count"]:
+        import faiss
+
+        n, d = meta["count"], meta["dim"]
+        vectors = np.memmap(os.path.join(index_dir, "vectors.f32"), dtype=np.float32, mode="r", shape=(n, d))
+        if backend == "hnsw":
+            params = {"m": 32, "ef_construction": 200, "ef_search": 64, **params}
+            index = faiss.IndexHNSWFlat(d, params["m"])
+            index.hnsw.efConstruction = params["ef_construction"]
+        else:
+            nlist = params.get("nlist") or int(4 * np.sqrt(n))
+            # faiss wants ~39 training points per centroid
+            nlist = max(1, min(nlist, n // 39))
+            pq_m = params.get("pq_m", 64)
+            while d % pq_m:
+                pq_m -= 1
+            params = {"nbits": 8, "nprobe": 16, **params, "nlist": nlist, "pq_m": pq_m}
+            if n < 2 ** params["nbits"]:
+                raise ValueError(f"IVF-PQ with nbits={params['nbits']} needs at least {2 ** params['nbits']} vectors, got {n}")
+            index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, pq_m, params["nbits"])
+            index.train(np.ascontiguousarray(vectors))
+
+        for start in range(0, n, 65536):
+            index.add(np.ascontiguousarray(vectors[start:start + 65536]))
+        faiss.write_index(index, ann_path)
+        meta["ann"] = {"backend": backend, **params}
+        print(f"🧭 Built {backend} ANN index over {n} vectors ({os.path.getsize(ann_path) / 2**20:.1f} MiB)")
+
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def load_ann(index_dir: str, ann: Optional[Dict[str, Any]]):
+    if not ann:
+        return None
+    import faiss
+
+    index = faiss.read_index(os.path.join(index_dir, ANN_FILE))
+    if ann["backend"] == "hnsw":
+        index.hnsw.efSearch = ann["ef_search"]
+    elif ann["backend"] == "ivfpq":
+        index.nprobe = ann["nprobe"]
+    return index
+
+
+def convert_faiss_index(faiss_dir: str, index_dir: str, model: str):
+    """Converts a LangChain FAISS save_local() directory into this format."""
+    from langchain_community.vectorstores import FAISS
+    from langchain_openai import OpenAIEmbeddings
+
+    store = FAISS.load_local(faiss_dir, OpenAIEmbeddings(model=model), allow_dangerous_deserialization=True)
+    writer = IndexWriter(index_dir, model)
+    for pos in range(store.index.ntotal):
+        doc_id = store.index_to_docstore_id[pos]
+        doc = store.docstore.search(doc_id)
+        writer.add([store.index.reconstruct(pos)], [{"id": doc_id, "text": doc.page_content, "metadata": doc.metadata}])
+    writer.close()
+    print(f"✅ Converted {writer.count} vectors from '{faiss_dir}' into '{index_dir}'")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a pickled FAISS index into the memory-mapped format.")
+    parser.add_argument("faiss_dir")
+    parser.add_argument("index_dir")
+    parser.add_argument("--model", default="text-embedding-ada-002")
+    args = parser.parse_args()
+    convert_faiss_index(args.faiss_dir, args.index_dir, args.model)
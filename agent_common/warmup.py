@@ -0,0 +1,48 @@
+"""
+Startup warmup for agents.
+
+run_warmup() runs named steps in order, logs how long each took and then
+marks the agent ready. Message handlers call wait_until_ready() so a
+question that arrives mid-warmup waits for it instead of redoing the work.
+A failing step is logged and skipped; the agent still becomes ready.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+WARMUP_WAIT_SECONDS = 60
+
+_ready = asyncio.Event()
+
+Step = Tuple[str, Callable[[], Awaitable[None]]]
+
+
+async def run_warmup(steps: List[Step], logger: logging.Logger = logging.getLogger(__name__)) -> Dict[str, float]:
+    timings = {}
+    start = time.perf_counter()
+    for label, step in steps:
+        step_start = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            logger.warning(f"⚠️ Warmup step '{label}' failed: {e}")
+        timings[label] = time.perf_counter() - step_start
+        logger.info(f"🔥 Warmup {label}: {timings[label]:.2f}s")
+    _ready.set()
+    logger.info(f"✅ Ready after {time.perf_counter() - start:.2f}s warmup")
+    return timings
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+async def wait_until_ready(timeout: float = WARMUP_WAIT_SECONDS):
+    """Waits for warmup to finish, but never longer than timeout."""
+    if not _ready.is_set():
+        try:
+            await asyncio.wait_for(_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -1,6 +1,13 @@
-from uagents import Agent
+from uagents import Agent, Context
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.clients import pool_stats
+from agent_common.warmup import run_warmup
+from animejs import refresh_vectorstore, warmup_steps
 from chat_proto import chat_proto
 
+# How often to check whether make_index.py published a new index
+INDEX_POLL_SECONDS = 30
+
 agent = Agent(
     name="animejs_agent_v2",
     seed="animejs_agent_v2",
@@ -10,5 +17,21 @@ agent = Agent(
 
 agent.include(chat_proto, publish_manifest=True)
 
+@agent.on_event("startup")
+async def warmup(ctx: Context):
+    await run_warmup(warmup_steps(), ctx.logger)
+
+@agent.on_interval(period=INDEX_POLL_SECONDS)
+async def reload_index(ctx: Context):
+    try:
+        if await refresh_vectorstore():
+            ctx.logger.info("Swapped in rebuilt vector index")
+    except Exception as e:
+        ctx.logger.error(f"Failed to reload vector index: {e}")
+
+@agent.on_interval(period=300)
+async def log_pool_stats(ctx: Context):
+    ctx.logger.info(f"HTTP pools: {pool_stats()}")
+
 if __name__ == "__main__":
     agent.run()
@@ -1,30 +1,97 @@
-from typing import Dict
-from openai import OpenAI, OpenAIError
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+import asyncio
 import os
-from uagents import Context
 import json
-from urllib.parse import quote
+import threading
 
-# RAG: LangChain imports
-from langchain_community.vectorstores import FAISS
-from langchain_openai.embeddings import OpenAIEmbeddings
-from langchain_openai.chat_models import ChatOpenAI
-from langchain.chains import RetrievalQA
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.clients import get_async_openai, get_embeddings
+from lz_string import compress_to_encoded_uri_component
 
+if TYPE_CHECKING:
+    from uagents import Context
+    from agent_common.query_cache import CachedEmbeddings
+    from result_cache import ResultCache
+    from agent_common.vector_index import MmapIndex
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
 
-# Load your FAISS index
-embedding = OpenAIEmbeddings()
-vectorstore = FAISS.load_local("animejs_docs_faiss_index", embedding, allow_dangerous_deserialization=True)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 8})
+LIVECODES_URL = "https://livecodes.io/"
+# Demos larger than this are compressed in a worker thread instead of on the event loop
+INLINE_COMPRESS_CHARS = 4096
 
-rag_chain = RetrievalQA.from_chain_type(
-    llm=ChatOpenAI(model="gpt-4o"),
-    retriever=retriever,
-    chain_type="stuff",
-)
+# Built by make_index.py; not checked in
+INDEX_DIR = os.getenv("ANIMEJS_INDEX_DIR", os.path.join(os.path.dirname(__file__), "animejs_docs_faiss_index"))
+
+# Importing this module builds nothing. The OpenAI client, embeddings and the
+# vector index (and the langchain/numpy imports behind them) are created on
+# first use, normally by the startup warmup.
+_embedding: Optional["CachedEmbeddings"] = None
+_vectorstore: Optional["MmapIndex"] = None
+# index_version() of the files _vectorstore was opened from
+_vectorstore_version: Optional[int] = None
+_result_cache: Optional["ResultCache"] = None
+_lock = threading.Lock()
+
+
+def get_client():
+    """Shared, pooled async client (see clients.py); the key comes from OPENAI_API_KEY."""
+    return get_async_openai()
+
+
+def get_embedding() -> "CachedEmbeddings":
+    global _embedding
+    with _lock:
+        if _embedding is None:
+            from agent_common.query_cache import CachedEmbeddings
+
+            _embedding = CachedEmbeddings(get_embeddings())
+        return _embedding
+
+
+def loaded_vectorstore() -> Tuple["MmapIndex", Optional[int]]:
+    """The memory-mapped vector index (see vector_index.py), opened on first use, and its version."""
+    global _vectorstore, _vectorstore_version
+    with _lock:
+        if _vectorstore is None:
+            from agent_common.vector_index import MmapIndex, index_version
+
+            _vectorstore_version = index_version(INDEX_DIR)
+            _vectorstore = MmapIndex(INDEX_DIR)
+        return _vectorstore, _vectorstore_version
+
+
+def get_vectorstore() -> "MmapIndex":
+    """The memory-mapped vector index, opened on first use."""
+    return loaded_vectorstore()[0]
+
+
+async def refresh_vectorstore() -> bool:
+    """
+    Reopens the vector index in a worker thread if make_index.py published a
+    new one. In-flight requests keep the old index. Returns True if swapped.
+    """
+    global _vectorstore, _vectorstore_version
+    from agent_common.vector_index import MmapIndex, index_version
+
+    version = index_version(INDEX_DIR)
+    if version is None or (_vectorstore is not None and version == _vectorstore_version):
+        return False
+
+    vectorstore = await asyncio.to_thread(MmapIndex, INDEX_DIR)
+    with _lock:
+        _vectorstore, _vectorstore_version = vectorstore, version
+    return True
+
+
+def get_result_cache() -> "ResultCache":
+    """Cache of generated demos (see result_cache.py)."""
+    global _result_cache
+    with _lock:
+        if _result_cache is None:
+            from result_cache import ResultCache
+
+            _result_cache = ResultCache()
+        return _result_cache
 
 # Prompt template using {context} and {description}
 PROMPT_TEMPLATE = """**IMPORTANT: DO NOT format the output using Markdown, triple backticks, or code fencing. Just output a raw JSON object as plain text.**
@@ -57,12 +124,54 @@ Now, return a raw JSON object with the requested files for this user request:
 """
 
 
-async def generate_code(ctx: Context, description: str) -> Dict[str, str]:
-    ctx.logger.info("Calling FAISS retriever for RAG context")
-    
+def warmup_steps():
+    """Startup steps for warmup.run_warmup."""
+
+    async def build_clients():
+        get_client()
+        get_embedding()
+        get_vectorstore()
+        get_result_cache()
+
+    async def prime_pool():
+        await get_client().models.list()
+
+    async def dummy_retrieval():
+        # Searches with a stored vector: pages the index in without an embedding call
+        vectorstore = get_vectorstore()
+        if len(vectorstore):
+            vectorstore.similarity_search_by_vector(vectorstore.vectors[0], k=8)
+
+    return [
+        ("clients and index", build_clients),
+        ("connection pool", prime_pool),
+        ("retrieval", dummy_retrieval),
+    ]
+
+
+async def generate_code(ctx: "Context", description: str) -> Dict[str, str]:
+    from result_cache import RESULT_CACHE_SEMANTIC
+
     try:
+        # 0. Reuse an earlier demo for the same (or, optionally, a very similar) request.
+        # Results are keyed on the index actually searched, not the one on disk,
+        # which may be newer until refresh_vectorstore picks it up.
+        cache = get_result_cache()
+        vectorstore, version = loaded_vectorstore()
+        cached = cache.get(description, version)
+        if cached is None:
+            vector = await get_embedding().aembed_query(description)
+            if RESULT_CACHE_SEMANTIC:
+                cached = cache.get_similar(vector, version)
+        if cached is not None:
+            ctx.logger.info(f"Result cache hit: {cache.stats()}")
+            return cached
+        cache.miss()
+
         # 1. Query FAISS index
-        docs = retriever.get_relevant_documents(description)
+        ctx.logger.info("Searching vector index for RAG context")
+        docs = vectorstore.similarity_search_by_vector(vector, k=8)
+        ctx.logger.info(f"Query embedding cache: {get_embedding().stats()}")
         context = "\n\n---\n\n".join(d.page_content for d in docs)
         ctx.logger.info(f"Retrieved context: {context}")
 
@@ -72,7 +181,7 @@ async def generate_code(ctx: Context, description: str) -> Dict[str, str]:
         ctx.logger.info("Calling OpenAI with retrieved context")
 
         # 3. Call GPT-4o
-        response = client.chat.completions.create(
+        response = await get_client().chat.completions.create(
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3
@@ -82,23 +191,37 @@ async def generate_code(ctx: Context, description: str) -> Dict[str, str]:
         ctx.logger.info(f"Parsing OpenAI response: {raw}")
 
         code_blocks = json.loads(raw)
-        return {
+        result = {
             "html": code_blocks.get("html", "").strip(),
             "css": code_blocks.get("css", "").strip(),
             "js": code_blocks.get("js", "").strip()
         }
+        cache.put(description, version, result, vector)
+        ctx.logger.info(f"Result cache miss: {cache.stats()}")
+        return result
 
     except Exception as e:
         ctx.logger.error(f"OpenAI or RAG error: {e}")
         raise
 
 
+def livecodes_project(html: str, css: str, js: str) -> Dict:
+    """LiveCodes project config with the three files, opened on the script editor."""
+    return {
+        "activeEditor": "script",
+        "markup": {"language": "html", "content": html},
+        "style": {"language": "css", "content": css},
+        "script": {"language": "javascript", "content": js},
+    }
+
+
+def build_livecodes_link(html: str, css: str, js: str) -> str:
+    """A LiveCodes link carrying the project as an lz-string compressed `x=code/...` payload."""
+    project = json.dumps(livecodes_project(html, css, js), ensure_ascii=False, separators=(",", ":"))
+    return f"{LIVECODES_URL}?x=code/{compress_to_encoded_uri_component(project)}"
+
+
 async def generate_livecodes_link(html: str, css: str, js: str) -> str:
-    return (
-        "https://livecodes.io/"
-        + "?active=script"
-        + "&template=javascript"
-        + f"&html={quote(html)}"
-        + f"&css={quote(css)}"
-        + f"&js={quote(js)}"
-    )
\ No newline at end of file
+    if len(html) + len(css) + len(js) > INLINE_COMPRESS_CHARS:
+        return await asyncio.to_thread(build_livecodes_link, html, css, js)
+    return build_livecodes_link(html, css, js)
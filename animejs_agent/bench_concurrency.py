@@ -0,0 +1,148 @@
+"""
+Checks that concurrent anime.js requests don't serialize on the event loop.
+
+Starts a local stand-in for the OpenAI API whose chat completions take
+--latency seconds (embeddings return at once), writes a small throwaway
+vector index (the query and result caches go in the same temp directory,
+never the real ones), and runs N generate_code calls at the same time on one
+event loop, as N chat sessions would. With the async path, N requests
+should finish in about the time of one. --blocking runs the same calls
+through the synchronous client, which is how generate_code used to work,
+for comparison.
+
+    python bench_concurrency.py --sessions 1 4 16 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+
+DIM = 1536
+COMPLETION = {"html": "<div class=\"ball\"></div>", "css": ".ball { width: 40px; }", "js": "import { animate } from 'animejs';"}
+
+
+def stand_in_server(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.endswith("/embeddings"):
+                inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                payload = {
+                    "object": "list",
+                    "model": body.get("model", ""),
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": [random.random() for _ in range(DIM)]}
+                        for i in range(len(inputs))
+                    ],
+                    "usage": {"prompt_tokens": 1, "total_tokens": 1},
+                }
+            else:
+                time.sleep(latency)
+                payload = {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": json.dumps(COMPLETION)}}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_index(index_dir: str, n: int = 200):
+    from agent_common.vector_index import IndexWriter
+
+    rng = np.random.default_rng(0)
+    writer = IndexWriter(index_dir, "bench")
+    writer.add(rng.random((n, DIM), dtype=np.float32), [{"id": str(i), "text": f"anime.js doc chunk {i}", "metadata": {}} for i in range(n)])
+    writer.close()
+
+
+class BenchContext:
+    logger = logging.getLogger("bench")
+
+
+async def blocking_generate_code(animejs, description: str):
+    """generate_code as it was: synchronous retrieval and completion inside a coroutine."""
+    from agent_common.clients import get_openai
+
+    vector = animejs.get_embedding().embed_query(description)
+    docs = animejs.get_vectorstore().similarity_search_by_vector(vector, k=8)
+    prompt = animejs.PROMPT_TEMPLATE.format(context="\n\n".join(d.page_content for d in docs), description=description)
+    response = get_openai().chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": prompt}], temperature=0.3)
+    return json.loads(response.choices[0].message.content)
+
+
+async def run_sessions(animejs, n: int, blocking: bool, sweep: int) -> float:
+    # Unique per sweep, so no call is answered from the result or embedding cache
+    descriptions = [f"bouncing ball number {i} of sweep {sweep}" for i in range(n)]
+    start = time.perf_counter()
+    if blocking:
+        await asyncio.gather(*(blocking_generate_code(animejs, d) for d in descriptions))
+    else:
+        await asyncio.gather(*(animejs.generate_code(BenchContext(), d) for d in descriptions))
+    return time.perf_counter() - start
+
+
+def main(sessions, latency: float, blocking: bool):
+    server = stand_in_server(latency)
+    workdir = tempfile.mkdtemp(prefix="bench_concurrency_")
+    try:
+        write_index(os.path.join(workdir, "index"))
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+        os.environ.update({
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": base_url,
+            "OPENAI_API_BASE": base_url,
+            "ANIMEJS_INDEX_DIR": os.path.join(workdir, "index"),
+            "QUERY_EMBEDDING_CACHE": os.path.join(workdir, "query_embeddings.sqlite3"),
+            "ANIMEJS_RESULT_CACHE": os.path.join(workdir, "results.sqlite3"),
+        })
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import animejs
+
+        async def sweep():
+            print(f"{'sessions':>9} {'path':>9} {'wall s':>8} {'x one call':>11}")
+            for sweep, n in enumerate(sessions):
+                seconds = await run_sessions(animejs, n, blocking, sweep)
+                print(f"{n:>9} {'blocking' if blocking else 'async':>9} {seconds:>8.2f} {seconds / latency:>11.1f}")
+
+        asyncio.run(sweep())
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time N concurrent generate_code calls against a slow stand-in API.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per chat completion")
+    parser.add_argument("--blocking", action="store_true", help="use the old synchronous client path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    main(args.sessions, args.latency, args.blocking)
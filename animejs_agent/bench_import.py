@@ -0,0 +1,77 @@
+"""
+Measures import cost with `python -X importtime`, to catch startup regressions.
+
+Each module is imported in a fresh interpreter (best of --runs). The
+report lists the total import time and the slowest top-level imports by
+cumulative time. With --budget-ms it exits non-zero when a module takes
+longer, so it can gate CI or a pre-commit hook.
+
+    python bench_import.py animejs chat_proto --top 10 --budget-ms 300
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+_line = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def import_times(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, depth) for every import made by importing module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _line.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure(module: str, runs: int) -> Tuple[int, Dict[str, int]]:
+    """Best-of-runs total (us) and the cumulative time of each direct dependency in that run."""
+    best_total, best_deps = None, {}
+    for _ in range(runs):
+        rows = import_times(module)
+        end = next(i for i, (name, _, _, depth) in enumerate(rows) if name == module and depth == 0)
+        # Children are printed before their parent, back to the previous top-level import
+        start = end
+        while start > 0 and rows[start - 1][3] > 0:
+            start -= 1
+        total = rows[end][2]
+        if best_total is None or total < best_total:
+            best_total = total
+            best_deps = {name: cum for name, _, cum, depth in rows[start:end] if depth == 1}
+    return best_total, best_deps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import time of agent modules.")
+    parser.add_argument("modules", nargs="*", default=["animejs"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if any module takes longer")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        total, deps = measure(module, args.runs)
+        print(f"📦 import {module}: {total / 1000:.1f} ms")
+        for name, cum in sorted(deps.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"   {name:<40} {cum / 1000:8.1f} ms")
+        if args.budget_ms is not None and total / 1000 > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"❌ Over the {args.budget_ms:g} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
@@ -0,0 +1,76 @@
+"""
+Compares LiveCodes link sizes: percent-encoded query parameters (the old
+generate_livecodes_link) against the lz-string `x=code/...` payload.
+
+Demos are read from the result cache (every {html, css, js} the agent has
+generated) or from a JSONL file with one {html, css, js} object per line.
+Reports p50/p95/max URL length for both encodings, the size ratio and
+the p50/max time to build a compressed link.
+
+    python bench_livecodes_links.py
+    python bench_livecodes_links.py --jsonl demos.jsonl
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from typing import Dict, List
+from urllib.parse import quote
+
+import numpy as np
+
+from animejs import build_livecodes_link
+from result_cache import RESULT_CACHE_PATH
+
+
+def percent_encoded_link(html: str, css: str, js: str) -> str:
+    return (
+        "https://livecodes.io/"
+        + "?active=script"
+        + "&template=javascript"
+        + f"&html={quote(html)}"
+        + f"&css={quote(css)}"
+        + f"&js={quote(js)}"
+    )
+
+
+def load_demos(jsonl: str = None, cache_path: str = RESULT_CACHE_PATH) -> List[Dict[str, str]]:
+    if jsonl:
+        with open(jsonl, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    db = sqlite3.connect(cache_path)
+    try:
+        return [json.loads(row[0]) for row in db.execute("SELECT result FROM results")]
+    finally:
+        db.close()
+
+
+def run(demos: List[Dict[str, str]]):
+    old, new, seconds = [], [], []
+    for demo in demos:
+        html, css, js = demo.get("html", ""), demo.get("css", ""), demo.get("js", "")
+        old.append(len(percent_encoded_link(html, css, js)))
+        start = time.perf_counter()
+        new.append(len(build_livecodes_link(html, css, js)))
+        seconds.append((time.perf_counter() - start) * 1000)
+
+    print(f"🔗 {len(demos)} demos")
+    print(f"{'encoding':>16} {'p50':>8} {'p95':>8} {'max':>8}")
+    for label, sizes in (("percent-encoded", old), ("lz-string", new)):
+        print(f"{label:>16} {np.percentile(sizes, 50):>8.0f} {np.percentile(sizes, 95):>8.0f} {max(sizes):>8}")
+    ratio = np.array(new) / np.array(old)
+    print(f"   compressed/original size: p50 {np.percentile(ratio, 50):.2f}, worst {ratio.max():.2f}")
+    print(f"   build time: p50 {np.percentile(seconds, 50):.2f} ms, max {max(seconds):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure LiveCodes link sizes before and after compression.")
+    parser.add_argument("--jsonl", help="demos as {html, css, js} lines (default: the result cache)")
+    parser.add_argument("--cache", default=RESULT_CACHE_PATH, help="result cache database to read demos from")
+    args = parser.parse_args()
+    demos = load_demos(args.jsonl, args.cache)
+    if not demos:
+        print("❌ No demos found. Generate some with the agent or pass --jsonl.")
+    else:
+        run(demos)
@@ -17,6 +17,8 @@ from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
 )
 
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.warmup import wait_until_ready
 from animejs import generate_code, generate_livecodes_link
 
 def create_text_chat(text: str) -> ChatMessage:
@@ -41,6 +43,7 @@ async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
         sender,
         ChatAcknowledgement(timestamp=datetime.utcnow(), acknowledged_msg_id=msg.msg_id),
     )
+    await wait_until_ready()
 
     for item in msg.content:
         if isinstance(item, StartSessionContent):
@@ -0,0 +1,175 @@
+"""
+lz-string's compressToEncodedURIComponent / decompressFromEncodedURIComponent.
+
+LiveCodes reads projects from a `x=code/<payload>` URL parameter, where the
+payload is the project JSON compressed with the JavaScript lz-string
+library. This is a port of that codec with identical output. Text is
+handled as UTF-16 code units, as in JavaScript, so characters outside the
+BMP round-trip the same way.
+"""
+
+from typing import Callable, Dict, List
+
+URI_SAFE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+-$"
+_URI_SAFE_INDEX = {c: i for i, c in enumerate(URI_SAFE_ALPHABET)}
+
+
+def _utf16_units(text: str) -> str:
+    data = text.encode("utf-16-le", "surrogatepass")
+    return "".join(chr(int.from_bytes(data[i:i + 2], "little")) for i in range(0, len(data), 2))
+
+
+def _from_utf16_units(units: str) -> str:
+    return b"".join(ord(c).to_bytes(2, "little") for c in units).decode("utf-16-le", "surrogatepass")
+
+
+class _BitWriter:
+    def __init__(self, bits_per_char: int, char_for: Callable[[int], str]):
+        self.bits_per_char = bits_per_char
+        self.char_for = char_for
+        self.out: List[str] = []
+        self.value = 0
+        self.position = 0
+
+    def write(self, value: int, bits: int):
+        """Writes the low `bits` bits of value, least significant first."""
+        for _ in range(bits):
+            self.value = (self.value << 1) | (value & 1)
+            if self.position == self.bits_per_char - 1:
+                self.position = 0
+                self.out.append(self.char_for(self.value))
+                self.value = 0
+            else:
+                self.position += 1
+            value >>= 1
+
+    def finish(self) -> str:
+        while True:
+            self.value <<= 1
+            if self.position == self.bits_per_char - 1:
+                self.out.append(self.char_for(self.value))
+                return "".join(self.out)
+            self.position += 1
+
+
+def _compress(units: str, bits_per_char: int, char_for: Callable[[int], str]) -> str:
+    dictionary: Dict[str, int] = {}
+    to_create = set()
+    w = ""
+    enlarge_in = 2
+    dict_size = 3
+    num_bits = 2
+    out = _BitWriter(bits_per_char, char_for)
+
+    def emit(w: str):
+        nonlocal enlarge_in, num_bits
+        if w in to_create:
+            code = ord(w[0])
+            if code < 256:
+                out.write(0, num_bits)
+                out.write(code, 8)
+            else:
+                out.write(1, num_bits)
+                out.write(code, 16)
+            enlarge_in -= 1
+            if enlarge_in == 0:
+                enlarge_in = 2 ** num_bits
+                num_bits += 1
+            to_create.discard(w)
+        else:
+            out.write(dictionary[w], num_bits)
+        enlarge_in -= 1
+        if enlarge_in == 0:
+            enlarge_in = 2 ** num_bits
+            num_bits += 1
+
+    for c in units:
+        if c not in dictionary:
+            dictionary[c] = dict_size
+            dict_size += 1
+            to_create.add(c)
+        wc = w + c
+        if wc in dictionary:
+            w = wc
+        else:
+            emit(w)
+            dictionary[wc] = dict_size
+            dict_size += 1
+            w = c
+
+    if w:
+        emit(w)
+    out.write(2, num_bits)  # end of stream
+    return out.finish()
+
+
+def _decompress(length: int, reset_value: int, value_at: Callable[[int], int]) -> str:
+    dictionary: List[str] = ["", "", ""]
+    enlarge_in = 4
+    dict_size = 4
+    num_bits = 3
+    data = {"val": value_at(0), "position": reset_value, "index": 1}
+
+    def read(bits: int) -> int:
+        result, power = 0, 1
+        for _ in range(bits):
+            resb = data["val"] & data["position"]
+            data["position"] >>= 1
+            if data["position"] == 0:
+                data["position"] = reset_value
+                data["val"] = value_at(data["index"]) if data["index"] < length else 0
+                data["index"] += 1
+            result |= power if resb > 0 else 0
+            power <<= 1
+        return result
+
+    kind = read(2)
+    if kind == 2:
+        return ""
+    c = chr(read(8 if kind == 0 else 16))
+    dictionary.append(c)
+    w = c
+    result = [c]
+    while True:
+        if data["index"] > length:
+            return ""
+        code = read(num_bits)
+        if code in (0, 1):
+            dictionary.append(chr(read(8 if code == 0 else 16)))
+            code = dict_size
+            dict_size += 1
+            enlarge_in -= 1
+        elif code == 2:
+            return "".join(result)
+
+        if enlarge_in == 0:
+            enlarge_in = 2 ** num_bits
+            num_bits += 1
+
+        if code < len(dictionary):
+            entry = dictionary[code]
+        elif code == dict_size:
+            entry = w + w[0]
+        else:
+            raise ValueError("Corrupt lz-string data")
+        result.append(entry)
+
+        dictionary.append(w + entry[0])
+        dict_size += 1
+        enlarge_in -= 1
+        w = entry
+
+        if enlarge_in == 0:
+            enlarge_in = 2 ** num_bits
+            num_bits += 1
+
+
+def compress_to_encoded_uri_component(text: str) -> str:
+    return _compress(_utf16_units(text), 6, URI_SAFE_ALPHABET.__getitem__)
+
+
+def decompress_from_encoded_uri_component(payload: str) -> str:
+    if not payload:
+        return ""
+    payload = payload.replace(" ", "+")
+    return _from_utf16_units(_decompress(len(payload), 32, lambda i: _URI_SAFE_INDEX[payload[i]]))
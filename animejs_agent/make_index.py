@@ -1,32 +1,77 @@
-from pathlib import Path
-from typing import List
+"""
+Builds or updates the anime.js docs index from an HTTrack copy of
+animejs.com/documentation.
+
+    python make_index.py --docs ~/animejs/animejs.com/documentation
+    python make_index.py --full --ann hnsw
+
+Pages are parsed in a process pool (lxml when installed, else html.parser).
+A manifest in the index records each page's mtime, size, hash and chunks,
+so a rebuild only parses pages that changed and only embeds chunks whose
+text isn't in the index already. The new index is written to a staging
+directory and swapped in with renames.
+"""
+
+import argparse
+import importlib.util
+import os
 import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 from bs4 import BeautifulSoup
-from langchain_community.vectorstores import FAISS
-from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.dedup import NearDuplicateFilter, dependent_sources, print_report
+from agent_common.embed_stage import EMBEDDING_MODEL, EmbeddingStage
+from agent_common.index_build import (
+    chunk_hash,
+    file_hash,
+    ingest_files,
+    load_manifest,
+    prepare_staging,
+    print_timings,
+    publish_index,
+    write_manifest,
+)
+from agent_common.vector_index import ANN_BACKENDS, IndexWriter, MmapIndex, build_ann
+
 # --- CONFIG ---
-DOCS_PATH = Path(r"C:/Users/sj05w/animejs/animejs.com/documentation")  # HTTrack root
-FAISS_INDEX_DIR = r"C:/Users/sj05w/fetch_projects/animejs_agent/animejs_docs_faiss_index"
+DOCS_PATH = os.getenv("ANIMEJS_DOCS_PATH", os.path.join("animejs.com", "documentation"))  # HTTrack root
+INDEX_DIR = os.getenv("ANIMEJS_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "animejs_docs_faiss_index"))
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
 CHUNK_SIZE = 900
 CHUNK_OVERLAP = 120
+EMBED_BATCH_SIZE = 256
+EMBED_MAX_IN_FLIGHT = 4
+ANN_BACKEND = "flat"  # or "hnsw" / "ivfpq" for large doc sets
+DEDUP_THRESHOLD = 0.9  # MinHash similarity at which a chunk counts as a repeat
 
-def extract_clean_text(file_path: Path) -> List[Document]:
+CHROME_TAGS = {"nav", "header", "footer", "aside", "form", "button"}
+CHROME_ATTR = re.compile(r"(sidebar|menu|nav|toc)", re.I)
+CONTENT_TAGS = ["h1", "h2", "h3", "p", "li", "code", "pre"]
+
+
+def is_chrome(tag) -> bool:
+    """Site chrome: nav/header/footer/... tags, or anything whose class or id looks like a sidebar, menu or TOC."""
+    if tag.name in CHROME_TAGS:
+        return True
+    return any(CHROME_ATTR.search(value) for value in [tag.get("id") or "", *(tag.get("class") or [])])
+
+def extract_clean_text(file_path: Path, docs_path: Path, parser: str = HTML_PARSER) -> List[Document]:
     """Extract docs: headings, paragraphs, lists, and code/pre. Remove nav/headers/footers/sidebars."""
     with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        soup = BeautifulSoup(f, "html.parser")
+        soup = BeautifulSoup(f, parser)
 
-    # Remove site chrome
-    for sel in ["nav", "header", "footer", "aside", "form", "button"]:
-        for tag in soup.find_all(sel):
+    # Remove site chrome in one pass over the tree
+    for tag in soup.find_all(is_chrome):
+        if not tag.decomposed:
             tag.decompose()
-    for tag in soup.find_all(attrs={"class": re.compile(r"(sidebar|menu|nav|toc)", re.I)}):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"id": re.compile(r"(sidebar|menu|nav|toc)", re.I)}):
-        tag.decompose()
 
     # Breadcrumb for metadata
     h1 = soup.find("h1")
@@ -36,7 +81,7 @@ def extract_clean_text(file_path: Path) -> List[Document]:
 
     # Collect docs content
     parts: List[str] = []
-    for tag in soup.find_all(["h1", "h2", "h3", "p", "li", "code", "pre"]):
+    for tag in soup.find_all(CONTENT_TAGS):
         txt = tag.get_text(" ", strip=True)
         if txt:
             parts.append(txt)
@@ -48,37 +93,237 @@ def extract_clean_text(file_path: Path) -> List[Document]:
     cleaned = "\n".join(parts)
     cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
 
-    rel = str(file_path.relative_to(DOCS_PATH)) if file_path.is_relative_to(DOCS_PATH) else str(file_path)
-    meta = {"source": rel, "breadcrumb": crumb}
+    meta = {"source": file_path.relative_to(docs_path).as_posix(), "breadcrumb": crumb}
     return [Document(page_content=cleaned, metadata=meta)]
 
-# --- Load & parse all HTML files ---
-all_docs: List[Document] = []
-for file in DOCS_PATH.rglob("*.html"):
-    all_docs.extend(extract_clean_text(file))
-
-print(f"✅ Loaded {len(all_docs)} cleaned HTML documents")
-
-# --- Split into chunks ---
-splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-chunks = splitter.split_documents(all_docs)
-print(f"✅ Split into {len(chunks)} chunks")
-
-# --- Deduplicate ---
-seen = set()
-deduped: List[Document] = []
-for d in chunks:
-    key = hash(d.page_content.strip())
-    if key not in seen:
-        seen.add(key)
-        deduped.append(d)
-print(f"✅ Deduplicated to {len(deduped)} chunks")
-
-# --- Embed & index ---
-embedding = OpenAIEmbeddings()
-vectorstore = FAISS.from_documents(deduped, embedding)
-Path(FAISS_INDEX_DIR).mkdir(parents=True, exist_ok=True)
-vectorstore.save_local(FAISS_INDEX_DIR)
-
-print(f"✅ FAISS index saved to folder: {FAISS_INDEX_DIR}")
-print("   (index.faiss and index.pkl should be inside this folder)")
+def scan_files(docs_path: Path, indexed: Dict[str, dict]) -> Dict[str, dict]:
+    """
+    Returns {source: {"path", "mtime_ns", "size", "sha256"}} for every page.
+    Pages whose mtime and size match the manifest keep their recorded hash
+    instead of being read again.
+    """
+    files = {}
+    print(f"🔍 Scanning {docs_path}...")
+    for fpath in sorted(docs_path.rglob("*.html")):
+        source = fpath.relative_to(docs_path).as_posix()
+        stat = fpath.stat()
+        known = indexed.get(source, {})
+        if known.get("mtime_ns") == stat.st_mtime_ns and known.get("size") == stat.st_size:
+            sha256 = known["sha256"]
+        else:
+            sha256 = file_hash(fpath)
+        files[source] = {"path": str(fpath), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}
+    return files
+
+def ingest_file(source: str, path: str, docs_path: str, parser: str) -> Tuple[str, List[Document], float]:
+    """Parses and splits one page. Runs in a worker process."""
+    start = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    pages = extract_clean_text(Path(path), Path(docs_path), parser)
+    return source, splitter.split_documents(pages), time.perf_counter() - start
+
+def extract_settings(parser: str) -> dict:
+    return {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "parser": parser}
+
+def build_docs_index(
+    docs_path: str = DOCS_PATH,
+    output_dir: str = INDEX_DIR,
+    full: bool = False,
+    workers: Optional[int] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+    ann: str = ANN_BACKEND,
+    dedup_threshold: float = DEDUP_THRESHOLD,
+    parser: str = HTML_PARSER,
+):
+    """
+    Builds or updates the index. Only new or changed pages are parsed, and
+    only chunks whose text isn't already in the index are embedded; the
+    rest reuse their stored vectors, even after a settings change forces a
+    re-parse. Chunks that near-duplicate an earlier one (MinHash similarity
+    >= dedup_threshold, 0 disables) are left out, and a page whose dropped
+    chunks repeated a changed or removed page is filtered again.
+    """
+    docs_root = Path(docs_path)
+    if not docs_root.is_dir():
+        print(f"❌ Docs folder '{docs_path}' not found. Pass --docs or set ANIMEJS_DOCS_PATH.")
+        return
+
+    timings = {}
+    start = time.perf_counter()
+    settings = extract_settings(parser)
+    manifest = None if full else load_manifest(output_dir, "extract", settings, "♻️ Chunking or parser settings changed, re-parsing every page.")
+    old_index = None
+    positions = {}
+    if manifest is not None or not full:
+        try:
+            old_index = MmapIndex(output_dir)
+            positions = {record["id"]: i for i, record in enumerate(old_index.records())}
+        except Exception as e:
+            if manifest is not None:
+                print(f"⚠️ Couldn't load existing index ({e}), rebuilding from scratch.")
+            manifest = None
+    # Chunk hashes recorded for every stored row, to reuse their vectors
+    row_hashes = {}
+    if manifest is None:
+        if old_index is not None:
+            for record in old_index.records():
+                row_hashes[record["id"]] = chunk_hash(record["text"])
+        manifest = {"extract": settings, "files": {}}
+    else:
+        for info in manifest["files"].values():
+            for chunk in info["chunks"]:
+                row_hashes[chunk["id"]] = chunk["hash"]
+
+    indexed = manifest["files"]
+    files = scan_files(docs_root, indexed)
+    timings["scan"] = time.perf_counter() - start
+    if not files:
+        print("❌ No HTML pages to index. Aborting.")
+        return
+
+    if manifest.get("dedup_threshold") != dedup_threshold:
+        # Re-filter every page; vectors of surviving chunks are reused below
+        if indexed:
+            print("♻️ Dedup threshold changed, re-filtering all pages.")
+        indexed_hashes = {}
+        manifest["dedup_threshold"] = dedup_threshold
+    else:
+        indexed_hashes = {s: info["sha256"] for s, info in indexed.items()}
+    changed = {s: info for s, info in files.items() if indexed_hashes.get(s) != info["sha256"]}
+    removed = [s for s in indexed if s not in files]
+    print(f"🧾 {len(files) - len(changed)} unchanged, {len(changed)} new or changed, {len(removed)} removed.")
+    # Chunks dropped as near-duplicates are only in the index through their kept copy
+    refiltered = dependent_sources(indexed, list(changed) + removed)
+    if refiltered:
+        print(f"♻️ Re-filtering {len(refiltered)} unchanged pages whose near-duplicates were kept in a changed or removed page.")
+        changed.update((s, files[s]) for s in refiltered)
+
+    current_ann = (old_index.meta.get("ann") or {}).get("backend", "flat") if old_index is not None else None
+    if not changed and not removed and current_ann == ann:
+        # Touched-but-identical pages: remember their new mtimes so the next scan skips hashing them
+        if any(indexed[s].get("mtime_ns") != info["mtime_ns"] for s, info in files.items()):
+            for source, info in files.items():
+                indexed[source].update(mtime_ns=info["mtime_ns"], size=info["size"])
+            write_manifest(output_dir, manifest)
+        print(f"✅ Index at '{output_dir}' is up to date.")
+        return
+
+    # Stored vector row for each chunk hash; anything that didn't change is reused
+    reusable_rows = {h: positions[doc_id] for doc_id, h in row_hashes.items() if doc_id in positions}
+    for source in removed:
+        del indexed[source]
+
+    # Copy rows of unchanged pages straight across; new chunks are checked against them
+    staging_dir = prepare_staging(output_dir)
+    writer = IndexWriter(staging_dir, EMBEDDING_MODEL)
+    dedup = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+    for source, info in indexed.items():
+        if source in changed:
+            continue
+        info.update(mtime_ns=files[source]["mtime_ns"], size=files[source]["size"])
+        rows = [positions[c["id"]] for c in info["chunks"] if c["id"] in positions]
+        records = [old_index.record(i) for i in rows]
+        writer.add(old_index.vectors[rows], records)
+        if dedup is not None:
+            for record in records:
+                dedup.add(record["text"], source)
+    timings["load index"] = time.perf_counter() - start
+
+    # Parse changed pages; results are ordered by source so dedup keeps the same chunk every run
+    start = time.perf_counter()
+    timings["parse (cpu)"] = 0.0
+    parsed = {}
+    for source, chunks, seconds in ingest_files(
+        ingest_file, {s: (info["path"], str(docs_root), parser) for s, info in changed.items()}, workers
+    ):
+        timings["parse (cpu)"] += seconds
+        if chunks is None:
+            indexed.pop(source, None)
+        else:
+            parsed[source] = chunks
+    timings["parse wall"] = time.perf_counter() - start
+
+    new_chunks: List[Tuple[str, Document, str]] = []
+    for source in sorted(parsed):
+        chunks = parsed[source]
+        ids = [f"{source}#{i}" for i in range(len(chunks))]
+        copies_of = set()
+        if dedup is not None:
+            kept, copies_of = dedup.filter_labeled((c.page_content for c in chunks), source)
+            ids, chunks = [ids[i] for i in kept], [chunks[i] for i in kept]
+        hashes = [chunk_hash(c.page_content) for c in chunks]
+        indexed[source] = {
+            "sha256": files[source]["sha256"],
+            "mtime_ns": files[source]["mtime_ns"],
+            "size": files[source]["size"],
+            "chunks": [{"id": i, "hash": h} for i, h in zip(ids, hashes)],
+        }
+        if copies_of - {source}:
+            indexed[source]["copies_of"] = sorted(copies_of - {source})
+        new_chunks.extend(zip(ids, chunks, hashes))
+    if dedup is not None:
+        print_report(dedup)
+
+    # Survives an interrupted run, so the next run only embeds what's left
+    start = time.perf_counter()
+    stage = EmbeddingStage(
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        checkpoint_path=f"{output_dir}.checkpoint.jsonl",
+    )
+    vectors = {h: np.array(old_index.vectors[reusable_rows[h]]) for _, _, h in new_chunks if h in reusable_rows}
+    to_embed = sorted({h: c.page_content for _, c, h in new_chunks if h not in vectors}.items())
+    if to_embed:
+        vectors.update(zip((h for h, _ in to_embed), stage.embed_sync([text for _, text in to_embed])))
+    if new_chunks:
+        writer.add(
+            [vectors[h] for _, _, h in new_chunks],
+            [{"id": i, "text": c.page_content, "metadata": c.metadata} for i, c, _ in new_chunks],
+        )
+    timings["embed"] = time.perf_counter() - start
+    print(f"🧩 {len(new_chunks)} chunks from {len(parsed)} changed pages, {len(to_embed)} needed embedding.")
+
+    writer.close()
+    if not writer.count:
+        shutil.rmtree(staging_dir)
+        print("❌ No documents to index. Aborting.")
+        return
+
+    start = time.perf_counter()
+    if ann != "flat":
+        build_ann(staging_dir, ann)
+        timings["ann"] = time.perf_counter() - start
+        start = time.perf_counter()
+    # Release the old index's memory maps before its directory is replaced
+    if old_index is not None:
+        old_index.close()
+    publish_index(staging_dir, output_dir, manifest)
+    stage.clear_checkpoint()
+    timings["save"] = time.perf_counter() - start
+    print(f"✅ Vector index saved to folder: {output_dir} ({writer.count} chunks)")
+    print_timings(timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the anime.js docs vector index.")
+    parser.add_argument("--docs", default=DOCS_PATH, help="HTTrack copy of animejs.com/documentation (env ANIMEJS_DOCS_PATH)")
+    parser.add_argument("--output", default=INDEX_DIR, help="index directory (env ANIMEJS_INDEX_DIR)")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-parse every page")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per CPU)")
+    parser.add_argument("--parser", choices=("lxml", "html.parser"), default=HTML_PARSER, help=f"BeautifulSoup backend (default: {HTML_PARSER})")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="texts per embedding request")
+    parser.add_argument("--max-in-flight", type=int, default=EMBED_MAX_IN_FLIGHT, help="concurrent embedding requests")
+    parser.add_argument("--ann", choices=ANN_BACKENDS, default=ANN_BACKEND, help="search backend (default: exact)")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD, help="near-duplicate similarity to drop at (0 disables)")
+    args = parser.parse_args()
+    build_docs_index(
+        docs_path=args.docs,
+        output_dir=args.output,
+        full=args.full,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+        ann=args.ann,
+        dedup_threshold=args.dedup_threshold,
+        parser=args.parser,
+    )
@@ -0,0 +1,160 @@
+"""
+Persistent cache of generated anime.js demos.
+
+Many requests are near-identical ("bouncing ball", "draggable square"),
+and each would otherwise pay for retrieval plus a full GPT-4o generation.
+Results ({html, css, js}) are stored in SQLite keyed by the normalized
+description. Optionally a request whose description embedding is within
+max_distance (cosine) of a cached one also gets that result.
+
+Every entry records the docs index version it was generated against. When
+the index is rebuilt, entries from older versions are dropped. Entries
+expire ttl seconds after creation, and the least recently used are
+evicted past max_entries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.query_cache import normalize_query
+
+RESULT_CACHE_PATH = os.getenv(
+    "ANIMEJS_RESULT_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "fetch_projects", "animejs_results.sqlite3"),
+)
+RESULT_CACHE_TTL = float(os.getenv("ANIMEJS_RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("ANIMEJS_RESULT_CACHE_SIZE", "5000"))
+RESULT_CACHE_SEMANTIC = os.getenv("ANIMEJS_RESULT_CACHE_SEMANTIC", "0") != "0"
+RESULT_CACHE_MAX_DISTANCE = float(os.getenv("ANIMEJS_RESULT_CACHE_DISTANCE", "0.05"))
+
+
+def description_key(description: str) -> str:
+    return hashlib.sha256(normalize_query(description).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        ttl: float = RESULT_CACHE_TTL,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_distance: float = RESULT_CACHE_MAX_DISTANCE,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        # Unit description vectors of the current version, for semantic lookups
+        self._keys: List[str] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, description TEXT, "
+            "index_version INTEGER, vector BLOB, result TEXT, created REAL, last_used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _use_version(self, version: Optional[int]):
+        """Drops entries built against any other index version. Call with the lock held."""
+        if version == self.version:
+            return
+        removed = self.db.execute("DELETE FROM results WHERE index_version IS NOT ?", (version,)).rowcount
+        if removed:
+            logging.info(f"🗑️ Docs index changed; dropped {removed} cached results")
+        self.version = version
+        self._load_vectors()
+
+    def _load_vectors(self):
+        rows = self.db.execute(
+            "SELECT key, vector FROM results WHERE vector IS NOT NULL AND created > ?",
+            (time.time() - self.ttl,),
+        ).fetchall()
+        self._keys = [key for key, _ in rows]
+        self._vectors = np.stack([array("f", blob) for _, blob in rows]).astype(np.float32) if rows else np.zeros((0, 0), np.float32)
+
+    def _fetch(self, key: str, now: float) -> Optional[Dict[str, str]]:
+        row = self.db.execute("SELECT result, created FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] >= self.ttl:
+            return None
+        self.db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def get(self, description: str, version: Optional[int]) -> Optional[Dict[str, str]]:
+        """Result cached for this exact (normalized) description, or None. Doesn't count a miss."""
+        now = time.time()
+        with self.lock:
+            self._use_version(version)
+            result = self._fetch(description_key(description), now)
+            if result is not None:
+                self.counters["exact_hits"] += 1
+            return result
+
+    def get_similar(self, vector, version: Optional[int]) -> Optional[Dict[str, str]]:
+        """Result for the nearest cached description within max_distance, or None."""
+        now = time.time()
+        with self.lock:
+            self._use_version(version)
+            if len(self._keys):
+                distances = 1.0 - self._vectors @ self._unit(vector)
+                i = int(np.argmin(distances))
+                if distances[i] <= self.max_distance:
+                    result = self._fetch(self._keys[i], now)
+                    if result is not None:
+                        self.counters["semantic_hits"] += 1
+                        return result
+            return None
+
+    def miss(self):
+        with self.lock:
+            self.counters["misses"] += 1
+
+    def put(self, description: str, version: Optional[int], result: Dict[str, str], vector=None):
+        now = time.time()
+        key = description_key(description)
+        blob = array("f", self._unit(vector).tolist()).tobytes() if vector is not None else None
+        with self.lock:
+            self._use_version(version)
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, description, version, blob, json.dumps(result), now, now),
+            )
+            evicted = self.db.execute(
+                "DELETE FROM results WHERE created <= ? OR key IN "
+                "(SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl, self.max_entries),
+            ).rowcount
+            if evicted or blob is None:
+                self._load_vectors()
+            elif key not in self._keys:
+                self._keys.append(key)
+                unit = self._unit(vector)[None, :]
+                self._vectors = unit if not self._vectors.size else np.vstack([self._vectors, unit])
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = sum(stats.values())
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import animejs
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.query_cache import CachedEmbeddings, QueryEmbeddingCache
+from agent_common.vector_index import META_FILE, IndexWriter, index_version
+from result_cache import ResultCache
+
+CTX = SimpleNamespace(logger=logging.getLogger("test_animejs"))
+
+
+class StubEmbeddings:
+    model = "stub-embedding"
+
+    async def aembed_query(self, text: str):
+        return [1.0, 0.0, 0.0]
+
+
+class StubCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, temperature):
+        self.calls += 1
+        content = json.dumps({"html": "", "css": "", "js": f"// demo {self.calls}"})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def publish(index_dir: str, text: str):
+    """Writes a one-chunk index next to index_dir and renames it into place, as make_index.py does."""
+    staging = f"{index_dir}.staging"
+    writer = IndexWriter(staging, "stub-embedding")
+    writer.add(np.array([[1.0, 0.0, 0.0]], dtype=np.float32), [{"id": "0", "text": text, "metadata": {}}])
+    writer.close()
+    if os.path.exists(index_dir):
+        # The loaded index keeps reading the moved files
+        shutil.rmtree(f"{index_dir}.old", ignore_errors=True)
+        os.rename(index_dir, f"{index_dir}.old")
+    os.rename(staging, index_dir)
+
+
+@pytest.fixture
+def completions(monkeypatch, tmp_path):
+    completions = StubCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(animejs, "INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(animejs, "_embedding", CachedEmbeddings(StubEmbeddings(), QueryEmbeddingCache(path=None)))
+    monkeypatch.setattr(animejs, "_vectorstore", None)
+    monkeypatch.setattr(animejs, "_vectorstore_version", None)
+    monkeypatch.setattr(animejs, "_result_cache", ResultCache(str(tmp_path / "results.sqlite3")))
+    monkeypatch.setattr(animejs, "get_client", lambda: client)
+    return completions
+
+
+def test_results_are_keyed_on_the_loaded_index(completions):
+    publish(animejs.INDEX_DIR, "old docs")
+    first = asyncio.run(animejs.generate_code(CTX, "a bouncing ball"))
+
+    # A rebuilt index on disk doesn't change what is searched until it is loaded,
+    # so results from the loaded index stay valid
+    publish(animejs.INDEX_DIR, "new docs")
+    meta = os.path.join(animejs.INDEX_DIR, META_FILE)
+    old_version = animejs.loaded_vectorstore()[1]
+    os.utime(meta, ns=(old_version + 1, old_version + 1))
+    assert asyncio.run(animejs.generate_code(CTX, "a bouncing ball")) == first
+    assert completions.calls == 1
+
+    assert asyncio.run(animejs.refresh_vectorstore())
+    vectorstore, version = animejs.loaded_vectorstore()
+    assert version == index_version(animejs.INDEX_DIR) != old_version
+    assert vectorstore.record(0)["text"] == "new docs"
+    assert asyncio.run(animejs.generate_code(CTX, "a bouncing ball")) != first
+    assert completions.calls == 2
+
+
+def test_refresh_is_a_no_op_when_the_index_is_unchanged(completions):
+    publish(animejs.INDEX_DIR, "docs")
+    animejs.get_vectorstore()
+    assert not asyncio.run(animejs.refresh_vectorstore())
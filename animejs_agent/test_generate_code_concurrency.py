@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import animejs
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.query_cache import CachedEmbeddings, QueryEmbeddingCache
+from result_cache import ResultCache
+
+CALLS = 8
+LATENCY = 0.2  # seconds per stubbed OpenAI request
+MAX_LOOP_GAP = 0.1
+
+
+class InFlight:
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+
+    async def during(self, seconds: float):
+        self.now += 1
+        self.peak = max(self.peak, self.now)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.now -= 1
+
+
+class StubEmbeddings:
+    model = "stub-embedding"
+
+    def __init__(self):
+        self.in_flight = InFlight()
+
+    async def aembed_query(self, text: str):
+        await self.in_flight.during(LATENCY)
+        return [float(len(text)), 1.0, 0.0]
+
+
+class StubCompletions:
+    def __init__(self):
+        self.in_flight = InFlight()
+
+    async def create(self, model, messages, temperature):
+        await self.in_flight.during(LATENCY)
+        content = json.dumps({"html": "<div class=\"ball\"></div>", "css": ".ball {}", "js": "animate('.ball', {});"})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class StubIndex:
+    def similarity_search_by_vector(self, vector, k: int):
+        return [SimpleNamespace(page_content=f"anime.js doc {i}") for i in range(k)]
+
+
+@pytest.fixture
+def stubs(monkeypatch, tmp_path):
+    embeddings = StubEmbeddings()
+    completions = StubCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(animejs, "INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(animejs, "_embedding", CachedEmbeddings(embeddings, QueryEmbeddingCache(path=None)))
+    monkeypatch.setattr(animejs, "_vectorstore", StubIndex())
+    monkeypatch.setattr(animejs, "_result_cache", ResultCache(str(tmp_path / "results.sqlite3")))
+    monkeypatch.setattr(animejs, "get_client", lambda: client)
+    return embeddings, completions
+
+
+async def run_with_ticker(coroutines):
+    """Runs coroutines together while a ticker measures the longest gap between event loop turns."""
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    try:
+        results = await asyncio.gather(*coroutines)
+    finally:
+        done.set()
+        await tick
+    return results, max(gaps)
+
+
+def test_generate_code_calls_overlap_without_blocking_the_loop(stubs):
+    embeddings, completions = stubs
+    ctx = SimpleNamespace(logger=logging.getLogger("test_generate_code"))
+    descriptions = [f"bouncing ball number {i}" for i in range(CALLS)]
+
+    start = time.perf_counter()
+    results, max_gap = asyncio.run(run_with_ticker(animejs.generate_code(ctx, d) for d in descriptions))
+    elapsed = time.perf_counter() - start
+
+    assert all(r["js"] == "animate('.ball', {});" for r in results)
+    assert embeddings.in_flight.peak == CALLS
+    assert completions.in_flight.peak == CALLS
+    # Serial calls would take 2 * CALLS * LATENCY
+    assert elapsed < 4 * LATENCY
+    assert max_gap < MAX_LOOP_GAP
@@ -0,0 +1,34 @@
+import pytest
+
+from lz_string import compress_to_encoded_uri_component, decompress_from_encoded_uri_component
+
+# Encodings produced by the reference lz-string implementation. JavaScript
+# strings are UTF-16, so the emoji is encoded as its two surrogate units.
+CASES = [
+    ("", "Q"),
+    ("a", "IZA"),
+    ("hello world", "BYUwNmD2AEDukCcwBMg"),
+    ("a" * 32, "IY18ZZA"),
+    ("héllo wörld ✓", "BYS4NmD2AEDuBvAnMATahkciA"),
+    ("emoji 🎉 outside the BMP", "KYWw9gVglgBIPBuEj9mYCuAXAzlAJsGaALPAIQFkAFIA"),
+    (
+        '{"activeEditor":"script","markup":{"language":"html","content":"<div class=\\"box\\"></div>"}}',
+        "N4IghgxgLglgbgUwKIBMZQPYCcQC4QDOEWMADlCADQgC2YWA1gK6l6gA2YAdgOZNg8EeEAAsoNdlRAQMXKAjnCAPGjgACCJwIEAvAB0QAIwwAPAwD4lAelXmQAX3tA",
+    ),
+    ("ab" * 12 + "x" * 300, "IYI17SOyA94YpyWrejmvZ7v+DCjiTSg"),
+]
+
+
+@pytest.mark.parametrize("text, encoded", CASES)
+def test_matches_reference_encoding(text, encoded):
+    assert compress_to_encoded_uri_component(text) == encoded
+
+
+@pytest.mark.parametrize("text, encoded", CASES)
+def test_decodes_reference_encoding(text, encoded):
+    assert decompress_from_encoded_uri_component(encoded) == text
+
+
+def test_round_trips_long_text():
+    text = "".join(chr(32 + (i * 7919) % 5000) for i in range(20000))
+    assert decompress_from_encoded_uri_component(compress_to_encoded_uri_component(text)) == text
@@ -1,5 +1,5 @@
-from uagents import Agent
-from chat_proto import chat_proto, struct_output_client_proto
+from uagents import Agent, Context
+from chat_proto import chat_proto, session_store, struct_output_client_proto
 
 # Create the Scorigami Agent
 scorigami_agent = Agent(
@@ -13,6 +13,14 @@ scorigami_agent = Agent(
 scorigami_agent.include(chat_proto)
 scorigami_agent.include(struct_output_client_proto)
 
+# Drop expired session entries from the session store
+@scorigami_agent.on_interval(period=3600)
+async def sweep_sessions(ctx: Context):
+    if session_store is not None:
+        expired = session_store.expire()
+        if expired:
+            ctx.logger.info(f"Expired {expired} idle session entries")
+
 # Start the agent
 if __name__ == "__main__":
     scorigami_agent.run()
@@ -14,6 +14,8 @@ from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
 )
 
+import repo_path  # noqa: F401  (makes agent_common importable)
+from agent_common.session_store import open_session_store
 from scorigami import get_scorigami_from_score, scorigamiRequest, scorigamiResponse
 
 # AI Agent Address for structured output processing
@@ -22,6 +24,12 @@ AI_AGENT_ADDRESS = 'agent1qtlpfshtlcxekgrfcpmv7m9zpajuwu7d5jfyachvpa4u3dkt6k0uww
 if not AI_AGENT_ADDRESS:
     raise ValueError("AI_AGENT_ADDRESS not set")
 
+# Session data lives here unless SESSION_STORE=agent selects ctx.storage
+session_store = open_session_store()
+
+def get_session_storage(ctx: Context):
+    return session_store if session_store is not None else ctx.storage
+
 def parse_latest_game(latest: str | None) -> tuple[str, str, str]:
     """
     Parses: "Team A vs. Team B Month Day Year"
@@ -79,7 +87,8 @@ class StructuredOutputResponse(Model):
 @chat_proto.on_message(ChatMessage)
 async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
     ctx.logger.info(f"Got a message from {sender}: {msg}")
-    ctx.storage.set(str(ctx.session), sender)
+    storage = get_session_storage(ctx)
+    storage.set(str(ctx.session), sender)
     await ctx.send(
         sender,
         ChatAcknowledgement(timestamp=datetime.utcnow(), acknowledged_msg_id=msg.msg_id),
@@ -91,7 +100,7 @@ async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
             continue
         elif isinstance(item, TextContent):
             ctx.logger.info(f"Got a message from {sender}: {item.text}")
-            ctx.storage.set(str(ctx.session) + ":raw_prompt", item.text.lower())
+            storage.set(str(ctx.session) + ":raw_prompt", item.text.lower())
             await ctx.send(
                 AI_AGENT_ADDRESS,
                 StructuredOutputPrompt(
@@ -112,7 +121,8 @@ async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
 async def handle_structured_output_response(
     ctx: Context, sender: str, msg: StructuredOutputResponse
 ):
-    session_sender = ctx.storage.get(str(ctx.session))
+    storage = get_session_storage(ctx)
+    session_sender = storage.get(str(ctx.session))
     if session_sender is None:
         ctx.logger.error(
             "Discarding message because no session sender found in storage"
@@ -126,7 +136,7 @@ async def handle_structured_output_response(
         score2 = scorigami_request.team2_score
 
         # Reject if both scores are 0 AND the original user message didn't contain anything that looks like a score
-        raw_prompt = ctx.storage.get(str(ctx.session) + ":raw_prompt")
+        raw_prompt = storage.get(str(ctx.session) + ":raw_prompt")
         if score1 == 0 and score2 == 0:
             if not any(keyword in raw_prompt for keyword in ["0", "zero"]):
                 await ctx.send(